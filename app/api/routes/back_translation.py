@@ -22,7 +22,8 @@ async def back_translation(request: BackTranslationBody):
                                                           languages=request.languages_lst,
                                                           exclude=request.exclude_lst,
                                                           is_segmented=request.is_segmented_bool,
-                                                          segment=request.segment_bool)
+                                                          segment=request.segment_bool,
+                                                          seed=request.seed_str)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Exception: {e}")
 
@@ -24,7 +24,9 @@ async def blank_augmentation(request: BlankNoiseBody):
                                                      max_aug=request.max_aug_str,
                                                      exclude=request.exclude_lst,
                                                      is_segmented=request.is_segmented_bool,
-                                                     segment=request.segment_bool)
+                                                     segment=request.segment_bool,
+                                                     seed=request.seed_str,
+                                                     num_variants=request.num_variants_str)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Exception: {e}")
 
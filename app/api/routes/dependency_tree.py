@@ -19,6 +19,7 @@ async def blank_augmentation(request: DependencyTreeBody):
         augmented_text = tree_handler.augment(text=request.text_str,
                                               is_segmented=request.is_segmented_bool,
                                               segment=request.segment_bool,
+                                              seed=request.seed_str,
                                               exclude=request.exclude_lst)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Exception: {e}")
@@ -12,7 +12,7 @@ logger.add("logs/pipeline_api.log", level="DEBUG", format=fmt, backtrace=True)
 
 
 @router.post("/", response_model=AugmentationResponse)
-async def pipeline_augmentation(request: PipelineBody):
+def pipeline_augmentation(request: PipelineBody):
     """
     Augmentation with specific pipeline
     """
@@ -24,6 +24,7 @@ async def pipeline_augmentation(request: PipelineBody):
                                                   pipeline=request.pipeline_lst,
                                                   is_segmented=request.is_segmented_bool,
                                                   segment=request.segment_bool,
+                                                  seed=request.seed_str,
                                                   n_sent=request.n_sent_str)
     except Exception as e:
         logger.error(f"Exception: {e}", exc_info=True)
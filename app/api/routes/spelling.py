@@ -19,7 +19,7 @@ char_aug = CharHandler()
 
 
 @router.post("/typo", response_model=AugmentationResponse)
-async def typo_augmentation(request: TypoBody):
+def typo_augmentation(request: TypoBody):
     """
     Augmentation by replacing token with its telex/vni/keyboard error.
     """
@@ -34,7 +34,9 @@ async def typo_augmentation(request: TypoBody):
                                           p_char_aug=request.p_aug_str,
                                           exclude=request.exclude_lst,
                                           is_segmented=request.is_segmented_bool,
-                                          segment=request.segment_bool)
+                                          segment=request.segment_bool,
+                                          seed=request.seed_str,
+                                          num_variants=request.num_variants_str)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Exception: {e}")
 
@@ -42,7 +44,7 @@ async def typo_augmentation(request: TypoBody):
 
 
 @router.post("/accent", response_model=AugmentationResponse)
-async def accent_augmentation(request: AccentBody):
+def accent_augmentation(request: AccentBody):
     """
     Augmentation by replacing token with missing/none/wrong accent.
     """
@@ -57,7 +59,9 @@ async def accent_augmentation(request: AccentBody):
                                             p_char_aug=request.p_aug_str,
                                             exclude=request.exclude_lst,
                                             is_segmented=request.is_segmented_bool,
-                                            segment=request.segment_bool)
+                                            segment=request.segment_bool,
+                                            seed=request.seed_str,
+                                            num_variants=request.num_variants_str)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Exception: {e}")
 
@@ -65,7 +69,7 @@ async def accent_augmentation(request: AccentBody):
 
 
 @router.post("/char", response_model=AugmentationResponse)
-async def char_augmentation(request: CharAugmentationBody):
+def char_augmentation(request: CharAugmentationBody):
     """
     Augmentation at character level.
     """
@@ -80,7 +84,9 @@ async def char_augmentation(request: CharAugmentationBody):
                                           p_char_aug=request.p_aug_str,
                                           exclude=request.exclude_lst,
                                           is_segmented=request.is_segmented_bool,
-                                          segment=request.segment_bool)
+                                          segment=request.segment_bool,
+                                          seed=request.seed_str,
+                                          num_variants=request.num_variants_str)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Exception: {e}")
 
@@ -88,7 +94,7 @@ async def char_augmentation(request: CharAugmentationBody):
 
 
 @router.post("/word", response_model=AugmentationResponse)
-async def word_augmentation(request: WordAugmentationBody):
+def word_augmentation(request: WordAugmentationBody):
     """
     Augmentation at word level
     """
@@ -103,7 +109,9 @@ async def word_augmentation(request: WordAugmentationBody):
                                           p_char_aug=request.p_aug_str,
                                           exclude=request.exclude_lst,
                                           is_segmented=request.is_segmented_bool,
-                                          segment=request.segment_bool)
+                                          segment=request.segment_bool,
+                                          seed=request.seed_str,
+                                          num_variants=request.num_variants_str)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Exception: {e}")
 
@@ -111,7 +119,7 @@ async def word_augmentation(request: WordAugmentationBody):
 
 
 @router.post("/spelling_replace", response_model=AugmentationResponse)
-async def spelling_replace_augmentation(request: SpellingReplaceBody):
+def spelling_replace_augmentation(request: SpellingReplaceBody):
     """
     Augmentation by substituting common Vietnamese confuse begin/end pairs.\n
     E.g.
@@ -131,7 +139,9 @@ async def spelling_replace_augmentation(request: SpellingReplaceBody):
                                            p_char_aug=request.p_aug_str,
                                            exclude=request.exclude_lst,
                                            is_segmented=request.is_segmented_bool,
-                                           segment=request.segment_bool)
+                                           segment=request.segment_bool,
+                                           seed=request.seed_str,
+                                           num_variants=request.num_variants_str)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Exception: {e}")
 
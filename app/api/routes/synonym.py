@@ -9,7 +9,7 @@ synonym_service = SynonymHandler()
 
 
 @router.post("/", response_model=AugmentationResponse)
-async def synonym_augmentation(request: SynonymBody):
+def synonym_augmentation(request: SynonymBody):
     """
     Augmentation by inserting/substituting token with its synonyms.
     """
@@ -25,7 +25,9 @@ async def synonym_augmentation(request: SynonymBody):
                                                  num_keep=request.num_keep_str,
                                                  exclude=request.exclude_lst,
                                                  is_segmented=request.is_segmented_bool,
-                                                 segment=request.segment_bool)
+                                                 segment=request.segment_bool,
+                                                 seed=request.seed_str,
+                                                 num_variants=request.num_variants_str)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Exception: {e}")
 
@@ -29,11 +29,34 @@ logging.basicConfig(
 logger.configure(handlers=[{"sink": sys.stderr, "level": LOGGING_LEVEL}])
 
 FASTTEXT_PATH = config("FASTTEXT_PATH", default="./model/cc.vi.300.vec")
+FASTTEXT_BINARY_PATH = config("FASTTEXT_BINARY_PATH", default="./model/cc.vi.300")
+FASTTEXT_DTYPE = config("FASTTEXT_DTYPE", default="float32")
+ANN_INDEX_PATH = config("ANN_INDEX_PATH", default="./model/fasttext_ivf")
+ANN_NPROBE = config("ANN_NPROBE", cast=int, default=0)
+ANN_MIN_RECALL = config("ANN_MIN_RECALL", cast=float, default=0.9)
+NEIGHBOUR_TABLE_PATH = config("NEIGHBOUR_TABLE_PATH", default="./model/fasttext_neighbours")
 PHOBERT_PATH = config("PHOBERT_PATH", default="./model/PhoBERT_base_fairseq")
+PHOBERT_LEAN_PATH = config("PHOBERT_LEAN_PATH", default="./model/PhoBERT_base_lean")
+PHOBERT_INFERENCE_MODE = config("PHOBERT_INFERENCE_MODE", default="fp32")
+PHOBERT_NUM_THREADS = config("PHOBERT_NUM_THREADS", cast=int, default=0)
+PHOBERT_BATCH_SIZE = config("PHOBERT_BATCH_SIZE", cast=int, default=16)
+PHOBERT_MICRO_BATCHING = config("PHOBERT_MICRO_BATCHING", cast=bool, default=False)
+PHOBERT_MAX_BATCH_SIZE = config("PHOBERT_MAX_BATCH_SIZE", cast=int, default=32)
+PHOBERT_MAX_WAIT_MS = config("PHOBERT_MAX_WAIT_MS", cast=float, default=5)
+PHOBERT_CACHE_SIZE = config("PHOBERT_CACHE_SIZE", cast=int, default=10000)
+FASTTEXT_CACHE_SIZE = config("FASTTEXT_CACHE_SIZE", cast=int, default=10000)
+MODEL_SERVER_ADDRESS = config("MODEL_SERVER_ADDRESS", default="")
+MODEL_SERVER_AUTHKEY: Secret = config("MODEL_SERVER_AUTHKEY", cast=Secret, default="")
+SYNONYM_SCORING = config("SYNONYM_SCORING", default="topk")
+SYNONYM_MIN_PROB = config("SYNONYM_MIN_PROB", cast=float, default=0.001)
 STOPWORD_PATH = config("STOPWORD_PATH", default="./data/vietnamese-stopwords.txt")
 IRRELEVANT_WORD_PATH = config("IRRELEVANT_WORD_PATH", default="./data/irrelevant_words.txt")
 EDIT_DISTANCE_PATH = config("EDIT_DISTANCE_PATH", default="./data/edit_distance.txt")
+TYPO_TABLE_PATH = config("TYPO_TABLE_PATH", default="./model/typo_tables")
+SHARED_TABLES_PATH = config("SHARED_TABLES_PATH", default="./model/shared_tables")
 MAX_CACHE_SIZE = config("MAX_CACHE_SIZE", cast=int, default=1000)
+RESULT_CACHE_SIZE = config("RESULT_CACHE_SIZE", cast=int, default=10000)
+MAX_NUM_VARIANTS = config("MAX_NUM_VARIANTS", cast=int, default=20)
 PHO_NLP_URL = config("PHO_NLP_URL", default="http://172.29.13.23:20217/")
 VN_CORE_PATH = config("VN_CORE_PATH", default="http://172.29.13.23")
 VN_CORE_PORT = config("VN_CORE_PORT", cast=int, default=20215)
@@ -7,6 +7,8 @@ def preload_model():
     """
     In order to load model on memory to each worker
     """
+    from app.core.config import SHARED_TABLES_PATH
+    from app.services.shared_tables import SharedTables
     from app.services.word_segment.word_segment import TextProcessor
     from app.services.synonym_handler import SynonymHandler
     from app.services.backtranslation_handler import BackTranslationHandler
@@ -19,6 +21,9 @@ def preload_model():
         CharHandler
     )
 
+    # the first worker to start publishes the tables, the others wait for it and attach them
+    SharedTables.publish(SHARED_TABLES_PATH)
+
     SynonymHandler.get_model()
     BackTranslationHandler.get_model()
     SpellingReplacementHandler.get_model()
@@ -2,6 +2,8 @@ from typing import AnyStr, List, Dict, Optional
 
 from pydantic import BaseModel, Field
 
+from app.core.config import MAX_NUM_VARIANTS
+
 
 class BaseBody(BaseModel):
     text: AnyStr
@@ -14,6 +16,9 @@ class BaseBody(BaseModel):
     segment: bool = Field(
         default=False, title="Want to word segment"
     )
+    seed: Optional[int] = Field(
+        default=None, ge=0, title="Seed for reproducible augmentation. Seeded results are cached"
+    )
 
     @property
     def text_str(self):
@@ -31,6 +36,10 @@ class BaseBody(BaseModel):
     def segment_bool(self):
         return self.segment
 
+    @property
+    def seed_str(self):
+        return self.seed
+
     def __repr__(self):
         return f"{self.text} {self.exclude} {self.is_segmented} {self.segment}"
 
@@ -45,6 +54,9 @@ class GeneralAugmentationBody(BaseBody):
     )
     max_aug: int = Field(
         default=2, title="Maximum number of token get augmented")
+    num_variants: int = Field(
+        default=1, ge=1, le=MAX_NUM_VARIANTS,
+        title="Number of augmented versions to draw from the sentence. Duplicates are dropped")
 
     @property
     def action_str(self):
@@ -62,8 +74,12 @@ class GeneralAugmentationBody(BaseBody):
     def max_aug_str(self):
         return self.max_aug
 
+    @property
+    def num_variants_str(self):
+        return self.num_variants
+
     def __repr__(self):
-        return f"{self.text} {self.action} {self.p_aug} {self.min_aug} {self.max_aug}"
+        return f"{self.text} {self.action} {self.p_aug} {self.min_aug} {self.max_aug} {self.num_variants}"
 
 
 class SynonymBody(GeneralAugmentationBody):
@@ -2,6 +2,7 @@ from typing import List
 
 from googletrans import Translator
 
+from app.services.cache import cached_augment
 from app.services.utils import mask_exclude_tokens, reconstruct, tokenize, revert_segmented_tokens
 from app.services.word_segment.word_segment import TextProcessor
 
@@ -20,26 +21,48 @@ class BackTranslationHandler:
         translated_text = self.translator.translate(text, src=src_lang, dest=dest_lang)
         return translated_text.text
 
-    def augment(self, text, src_language, languages, exclude, is_segmented, segment, **kwargs) -> List[str]:
-        transform_text = []
-        
+    def _translate_batch(self, texts, src_lang="vi", dest_lang="en"):
+        return [translated.text for translated in self.translator.translate(texts, src=src_lang, dest=dest_lang)]
+
+    def augment(self, text, src_language, languages, exclude, is_segmented, segment, seed=None,
+                **kwargs) -> List[str]:
+        return self.augment_batch([text], src_language, languages, exclude, is_segmented, segment, seed=seed,
+                                  **kwargs)[0]
+
+    def augment_batch(self, texts, src_language, languages, exclude, is_segmented, segment, seed=None,
+                      **kwargs) -> List[List[str]]:
+        """
+        Translation is deterministic; a ``seed`` only opts the texts into the result cache.
+        """
+        params = dict(src_language=src_language, languages=languages, exclude=exclude, is_segmented=is_segmented,
+                      segment=segment)
+        return cached_augment(self, None, texts, seed, params,
+                              lambda batch: self._augment_batch(batch, src_language, languages, exclude,
+                                                                is_segmented, segment))
+
+    def _augment_batch(self, texts, src_language, languages, exclude, is_segmented, segment) -> List[List[str]]:
         if exclude:
-            return [text]
-        
+            return [[text] for text in texts]
+
         # text, exclude_map = mask_exclude_tokens(text, exclude)
 
         if is_segmented:
-            tokens = tokenize(text)
-            text = " ".join(revert_segmented_tokens(tokens))
+            texts = [" ".join(revert_segmented_tokens(tokenize(text))) for text in texts]
+
+        transform_texts = [[] for _ in texts]
+        if not texts:
+            return transform_texts
 
         for lang in languages:
-            translated = self._translate(text, src_lang=src_language, dest_lang=lang)
-            back_translated = self._translate(translated, src_lang=lang, dest_lang="vi")
-            transform_text.append(back_translated)
+            translated = self._translate_batch(texts, src_lang=src_language, dest_lang=lang)
+            back_translated = self._translate_batch(translated, src_lang=lang, dest_lang="vi")
+            for transform_text, back_translated_text in zip(transform_texts, back_translated):
+                transform_text.append(back_translated_text)
 
         # transform_text = [reconstruct(t, exclude_map) for t in transform_text]
 
         if segment:
-            transform_text = [text_processor.process(t) for t in transform_text]
+            transform_texts = [[text_processor.process(t) for t in transform_text]
+                               for transform_text in transform_texts]
 
-        return transform_text
+        return transform_texts
@@ -1,12 +1,40 @@
-import random
+import string
 from typing import List
 
 import numpy as np
 
-from app.services.utils import mask_exclude_tokens, reconstruct, revert_segmented_tokens, tokenize
+from app.services.cache import cached_augment
+from app.services.utils import mask_exclude_tokens, reconstruct, revert_segmented_tokens, text_rng, tokenize
 from app.services.word_segment.word_segment import TextProcessor
 
 text_processor = TextProcessor()
+PUNCTUATION = np.array(list(string.punctuation))
+
+
+def eligible_token_mask(tokens, ineligible=PUNCTUATION, mask_prefix="MASK"):
+    """
+    Vectorized eligibility: a token is eligible unless it is in ``ineligible`` or is an exclude mask.
+    """
+    tokens = np.array(tokens, dtype=str)
+    return ~np.isin(tokens, ineligible) & ~np.char.startswith(tokens, mask_prefix)
+
+
+def sample_eligible_indices(mask, p_aug=0.1, min_aug=1, max_aug=10, rng=np.random):
+    """
+    Pick augmentation indices among the eligible positions of ``mask``: every eligible index is kept
+    with probability ``p_aug`` (visited in random order, at most ``max_aug``), then the selection is
+    topped up with other eligible indices to reach ``min_aug``.
+    """
+    indices = rng.permutation(np.flatnonzero(mask))
+
+    chosen = np.zeros(len(indices), dtype=bool)
+    chosen[np.flatnonzero(rng.random(len(indices)) < p_aug)[:max_aug]] = True
+
+    n_left = min_aug - int(chosen.sum())
+    if n_left > 0:
+        chosen[np.flatnonzero(~chosen)[:n_left]] = True
+
+    return rng.permutation(indices[chosen])
 
 
 class Augmenter:
@@ -17,7 +45,24 @@ class Augmenter:
     def remove_duplicate(augmented_list: List[str]):
         return list(set(augmented_list))
 
-    def _get_eligible_indices(self, text, p_aug=0.1, min_aug=1, max_aug=10, exclude=None, is_segmented=False):
+    @staticmethod
+    def collect_variants(variants, seen=None):
+        """
+        Keep the first occurrence of every text, in the order generated.
+        """
+        seen = set() if seen is None else seen
+        unique = []
+        for variant in variants:
+            if variant not in seen:
+                seen.add(variant)
+                unique.append(variant)
+        return unique
+
+    def _analyze(self, text, exclude=None, is_segmented=False):
+        """
+        Mask excludes, tokenize and compute the eligibility mask of ``text``: the part of an
+        augmentation shared by every variant drawn from it.
+        """
         if not exclude:
             exclude = list()
 
@@ -27,24 +72,17 @@ class Augmenter:
         if is_segmented:
             tokens = revert_segmented_tokens(tokens)
 
-        mask = np.array([self._is_eligible_token(token) for token in tokens])
-        indices = np.where(mask)[0].tolist()
-        random.shuffle(indices)
-        eligible_indices = []
+        return tokens, self._eligible_mask(tokens), exclude_map
 
-        for idx in indices:
-            if len(eligible_indices) == max_aug:
-                break
-            if random.uniform(0, 1) < p_aug and idx not in eligible_indices:
-                eligible_indices.append(idx)
+    def _get_eligible_indices(self, text, p_aug=0.1, min_aug=1, max_aug=10, exclude=None, is_segmented=False,
+                              rng=np.random):
+        tokens, mask, exclude_map = self._analyze(text, exclude=exclude, is_segmented=is_segmented)
 
-        if len(eligible_indices) < min_aug:
-            n_left = min_aug - len(eligible_indices)
-            random_idx = random.sample(indices, n_left)
-            eligible_indices.extend(random_idx)
+        eligible_indices = sample_eligible_indices(mask, p_aug=p_aug, min_aug=min_aug, max_aug=max_aug, rng=rng)
+        return tokens, eligible_indices.tolist(), exclude_map
 
-        random.shuffle(eligible_indices)
-        return tokens, eligible_indices, exclude_map
+    def _eligible_mask(self, tokens):
+        return np.array([self._is_eligible_token(token) for token in tokens], dtype=bool)
 
     def _is_eligible_token(self, token):
         raise NotImplementedError
@@ -60,9 +98,13 @@ class Augmenter:
     def validate_action(action):
         raise NotImplementedError
 
-    def transform(self, action, tokens, eligible_indices, **kwargs):
+    def transform(self, action, tokens, eligible_indices, rng=np.random, **kwargs):
         raise NotImplementedError
 
+    def transform_batch(self, action, tokens_batch, eligible_indices_batch, rngs, **kwargs) -> List[List[str]]:
+        return [self.transform(action, tokens, eligible_indices, rng=rng, **kwargs)
+                for tokens, eligible_indices, rng in zip(tokens_batch, eligible_indices_batch, rngs)]
+
     def augment(self,
                 action,
                 text,
@@ -72,21 +114,64 @@ class Augmenter:
                 exclude,
                 is_segmented,
                 segment,
+                num_variants=1,
+                seed=None,
                 **kwargs):
+        return self.augment_batch(action, [text], p_aug, min_aug, max_aug, exclude, is_segmented, segment,
+                                  num_variants=num_variants, seed=seed, **kwargs)[0]
+
+    def augment_batch(self,
+                      action,
+                      texts,
+                      p_aug,
+                      min_aug,
+                      max_aug,
+                      exclude,
+                      is_segmented,
+                      segment,
+                      num_variants=1,
+                      seed=None,
+                      **kwargs) -> List[List[str]]:
+        """
+        Augment every text with the same settings and return the augmented texts of each input.
+        With a ``seed`` the output of each text is reproducible and served from the result cache.
+        """
         self.validate_action(action)
 
-        tokens, eligible_indices, exclude_map = self._get_eligible_indices(text,
-                                                                           p_aug=p_aug,
-                                                                           min_aug=min_aug,
-                                                                           max_aug=max_aug,
-                                                                           exclude=exclude,
-                                                                           is_segmented=is_segmented)
-
-        transform_text = self.transform(action, tokens, eligible_indices, **kwargs)
-
-        if segment:
-            transform_text = [text_processor.process(t) for t in transform_text]
-
-        transform_text = self.postprocess(transform_text, exclude_map)
-
-        return transform_text
+        params = dict(p_aug=p_aug, min_aug=min_aug, max_aug=max_aug, exclude=exclude, is_segmented=is_segmented,
+                      segment=segment, num_variants=num_variants, **kwargs)
+        return cached_augment(self, action, texts, seed, params,
+                              lambda batch: self._augment_batch(action, batch, p_aug, min_aug, max_aug, exclude,
+                                                                is_segmented, segment, num_variants, seed, **kwargs))
+
+    def _augment_batch(self, action, texts, p_aug, min_aug, max_aug, exclude, is_segmented, segment, num_variants,
+                       seed, **kwargs):
+        """
+        Each text is analyzed once and ``num_variants`` independent draws are made from that analysis;
+        duplicate variants are dropped as they are generated.
+        Handlers that can share work across texts override ``transform_batch``.
+        """
+        tokens_batch, eligible_indices_batch, rngs, exclude_maps = [], [], [], []
+        for text in texts:
+            rng = text_rng(seed, text)
+            tokens, mask, exclude_map = self._analyze(text, exclude=exclude, is_segmented=is_segmented)
+            for _ in range(num_variants):
+                eligible_indices = sample_eligible_indices(mask, p_aug=p_aug, min_aug=min_aug, max_aug=max_aug,
+                                                           rng=rng)
+                tokens_batch.append(tokens)
+                eligible_indices_batch.append(eligible_indices.tolist())
+                rngs.append(rng)
+            exclude_maps.append(exclude_map)
+
+        transform_batch = self.transform_batch(action, tokens_batch, eligible_indices_batch, rngs, **kwargs)
+
+        results = []
+        for i, exclude_map in enumerate(exclude_maps):
+            variants = transform_batch[i * num_variants:(i + 1) * num_variants]
+            transform_text = self.collect_variants(variant for texts in variants for variant in texts)
+            if segment:
+                transform_text = [text_processor.process(t) for t in transform_text]
+
+            results.append(self.postprocess(transform_text, exclude_map))
+
+        return results
@@ -0,0 +1,16 @@
+DEFAULT_SENTENCES = [
+    "Hôm nay trời đẹp nên chúng tôi đi dạo quanh hồ .",
+    "Sinh viên cần nộp bài tập trước ngày thứ sáu .",
+    "Công ty vừa công bố kết quả kinh doanh quý ba .",
+    "Người dân địa phương rất thân thiện và hiếu khách .",
+]
+
+
+def load_sentences(path):
+    """
+    Sentences of the benchmark scripts: one per non-empty line of ``path``, a few built-in ones without it.
+    """
+    if not path:
+        return DEFAULT_SENTENCES
+    with open(path, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
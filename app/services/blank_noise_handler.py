@@ -1,8 +1,10 @@
-import random
 import string
 from typing import List
 
-from app.services.base_augmenter import Augmenter
+import numpy as np
+
+from app.services.base_augmenter import Augmenter, eligible_token_mask
+from app.services.token_batch import TokenBatch
 
 
 class BlankNoiseHandler(Augmenter):
@@ -13,16 +15,16 @@ class BlankNoiseHandler(Augmenter):
     def _is_eligible_token(self, token):
         return token not in string.punctuation and not token.startswith("MASK")
 
-    def transform(self, action, tokens, eligible_indices, **kwargs) -> List[str]:
-        augmented_data = []
-        tmp = tokens.copy()
-
-        for idx in eligible_indices:
-            tmp[idx] = "_"
+    def _eligible_mask(self, tokens):
+        return eligible_token_mask(tokens)
 
-        augmented_data.append(" ".join(tmp))
+    def transform(self, action, tokens, eligible_indices, **kwargs) -> List[str]:
+        return self.transform_batch(action, [tokens], [eligible_indices], [np.random], **kwargs)[0]
 
-        return self.remove_duplicate(augmented_data)
+    def transform_batch(self, action, tokens_batch, eligible_indices_batch, rngs, **kwargs) -> List[List[str]]:
+        batch = TokenBatch.from_lists(tokens_batch)
+        positions, _, _ = batch.flat_positions(eligible_indices_batch)
+        return [[text] for text in batch.blank(positions).to_strings()]
 
     @staticmethod
     def validate_action(action):
@@ -0,0 +1,95 @@
+import threading
+from collections import OrderedDict
+
+from app.core.config import RESULT_CACHE_SIZE
+
+
+class LRUCache:
+    """
+    Bounded, thread-safe least-recently-used cache with hit/miss counters.
+    """
+
+    def __init__(self, maxsize=1000):
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.data)
+
+    def get(self, key, default=None):
+        with self.lock:
+            if key in self.data:
+                self.data.move_to_end(key)
+                self.hits += 1
+                return self.data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self.lock:
+            self.data[key] = value
+            self.data.move_to_end(key)
+            while len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+
+    def get_many(self, keys, compute):
+        """
+        Look up every key; the missing ones are computed together with a single ``compute(missing_keys)`` call.
+        """
+        missing = object()
+        values = [self.get(key, missing) for key in keys]
+        missing_indices = [i for i, value in enumerate(values) if value is missing]
+
+        if missing_indices:
+            computed = compute([keys[i] for i in missing_indices])
+            for i, value in zip(missing_indices, computed):
+                values[i] = value
+                self.put(keys[i], value)
+        return values
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        return {"size": len(self.data), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
+
+
+def freeze(value):
+    """
+    Hashable form of request parameters (dicts, lists and pydantic models) for use in cache keys.
+    """
+    if isinstance(value, dict):
+        return tuple(sorted((key, freeze(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    if isinstance(value, (set, frozenset)):
+        return frozenset(freeze(item) for item in value)
+    if hasattr(value, "dict") and callable(value.dict):
+        return freeze(value.dict())
+    return value
+
+
+result_cache = LRUCache(maxsize=RESULT_CACHE_SIZE)
+
+
+def cached_augment(handler, action, texts, seed, params, augment):
+    """
+    Return ``augment(texts)``. With a ``seed`` the output of a text is reproducible, so results are
+    cached per text under (handler, action, params, text, seed); only the missing texts are augmented,
+    in a single ``augment`` call.
+    """
+    if seed is None:
+        return augment(texts)
+
+    params = freeze(params)
+    keys = [(type(handler).__name__, action, params, text, seed) for text in texts]
+    results = result_cache.get_many(keys, lambda missing: augment([key[3] for key in missing]))
+    return [list(result) for result in results]
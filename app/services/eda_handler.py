@@ -1,10 +1,10 @@
-import random
 import string
 from typing import List
 
 import numpy as np
 
-from app.services.base_augmenter import Augmenter
+from app.services.base_augmenter import Augmenter, eligible_token_mask
+from app.services.token_batch import TokenBatch
 
 
 class EdaHandler(Augmenter):
@@ -17,34 +17,29 @@ class EdaHandler(Augmenter):
     def _is_eligible_token(self, token):
         return token not in string.punctuation and not token.startswith("MASK")
 
+    def _eligible_mask(self, tokens):
+        return eligible_token_mask(tokens)
+
     @staticmethod
     def validate_action(action):
         assert action in ["delete", "swap"], "Please choose action in {delete, swap}"
 
-    def transform(self, action, tokens, eligible_indices, **kwargs) -> List[str]:
-        augmented_data = []
-        tmp = tokens.copy()
-
-        eligible_indices = np.array(eligible_indices)
-
-        for idx in eligible_indices:
-            if action == "delete":
-                tmp.pop(idx)
-                eligible_indices[eligible_indices > idx] = eligible_indices[eligible_indices > idx] - 1
-            elif action == "swap":
-                org_indices = list(range(len(tmp)))
-
-                random_idx = random.choice(org_indices)
-                while tmp[random_idx].startswith("MASK"):
-                    random_idx = random.choice(org_indices)
-                tmp[idx], tmp[random_idx] = tmp[random_idx], tmp[idx]
-        #     if action == "delete":
-        #         tmp.pop(idx)
-        #     elif action == "swap":
-        #         org_indices = list(range(len(tmp)))
-        #         org_indices.pop(idx)
-        #         tmp[idx], tmp[random_idx] = tmp[random_idx], tmp[idx]
-
-        augmented_data.append(" ".join(tmp))
-
-        return self.remove_duplicate(augmented_data)
+    def transform(self, action, tokens, eligible_indices, rng=np.random, **kwargs) -> List[str]:
+        return self.transform_batch(action, [tokens], [eligible_indices], [rng], **kwargs)[0]
+
+    def transform_batch(self, action, tokens_batch, eligible_indices_batch, rngs, **kwargs) -> List[List[str]]:
+        """
+        Delete the eligible tokens, or swap each of them with a random non-excluded token of its sentence,
+        over the whole batch at once.
+        """
+        batch = TokenBatch.from_lists(tokens_batch)
+        positions, rows, ranks = batch.flat_positions(eligible_indices_batch)
+
+        if action == "delete":
+            batch = batch.delete(positions)
+        elif action == "swap":
+            not_masked = ~np.char.startswith(batch.tokens.astype(str), "MASK")
+            partners = batch.random_positions(not_masked, rows, rngs)
+            batch = batch.swap(positions, partners, ranks)
+
+        return [[text] for text in batch.to_strings()]
@@ -1,9 +1,9 @@
-import random
 from typing import List
 
 from loguru import logger
 
-from app.services.utils import revert_segmented_tokens, tokenize, mask_exclude_tokens, reconstruct
+from app.services.cache import cached_augment
+from app.services.utils import revert_segmented_tokens, tokenize, mask_exclude_tokens, reconstruct, text_rng
 from app.services.word_segment.word_segment import TextProcessor
 from app.services.synonym_handler import SynonymHandler
 from app.services.blank_noise_handler import BlankNoiseHandler
@@ -42,9 +42,16 @@ class PipelineHandler:
     def remove_duplicate(augmented_list: List[str]):
         return list(set(augmented_list))
 
-    def augment(self, text, exclude, pipeline, is_segmented, segment, n_sent):
+    def augment(self, text, exclude, pipeline, is_segmented, segment, n_sent, seed=None):
+        params = dict(exclude=exclude, pipeline=pipeline, is_segmented=is_segmented, segment=segment, n_sent=n_sent)
+        return cached_augment(self, None, [text], seed, params,
+                              lambda batch: [self._augment(batch[0], exclude, pipeline, is_segmented, segment,
+                                                           n_sent, seed)])[0]
+
+    def _augment(self, text, exclude, pipeline, is_segmented, segment, n_sent, seed):
         results = []
         transform_text = text
+        rng = text_rng(seed, text)
 
         try:
             if is_segmented:
@@ -52,8 +59,8 @@ class PipelineHandler:
                 transform_text = " ".join(revert_segmented_tokens(tokens))
 
             for _ in range(n_sent):
-                num_action = random.choice(range(1, len(pipeline))) if len(pipeline) > 1 else 1
-                tmp_pipeline = random.sample(pipeline, num_action)
+                num_action = int(rng.integers(1, len(pipeline))) if len(pipeline) > 1 else 1
+                tmp_pipeline = [pipeline[i] for i in rng.permutation(len(pipeline))[:num_action]]
 
                 for aug_type in tmp_pipeline:
                     aug_type = vars(aug_type)
@@ -61,6 +68,8 @@ class PipelineHandler:
                                                                     exclude=exclude,
                                                                     is_segmented=False,
                                                                     segment=False,
+                                                                    seed=None if seed is None
+                                                                    else int(rng.integers(2 ** 32)),
                                                                     **aug_type)
     
                     if not tmp_text:
@@ -85,4 +94,5 @@ class PipelineHandler:
         if not results:
             return [text]
 
-        return self.remove_duplicate(results)
+        # ordered de-duplication keeps seeded results reproducible across processes
+        return list(dict.fromkeys(results))
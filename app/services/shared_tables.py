@@ -0,0 +1,244 @@
+import argparse
+import fcntl
+import json
+import os
+import shutil
+import time
+from collections.abc import Mapping, Sequence
+from contextlib import contextmanager
+
+import numpy as np
+from loguru import logger
+
+EDIT_DISTANCE_TABLE = "edit_distance"
+IRRELEVANT_VOCAB_TABLE = "irrelevant_vocab"
+MANIFEST_FILE = "manifest.json"
+# bumped when the layout or the order of the published tables changes, so older versions are republished
+TABLES_FORMAT = 2
+
+
+def load_mapped(file_path):
+    """
+    Memory-map a ``.npy`` file as a plain ndarray: slicing a ``np.memmap`` creates a new memmap object
+    every time, which dominates the cost of the small lookups done on these tables.
+    """
+    return np.load(file_path, mmap_mode="r").view(np.ndarray)
+
+
+@contextmanager
+def publish_lock(path):
+    """
+    Serialize the publishers of ``path``, e.g. every worker of one server starting at once.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(f"{path}.lock", "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        yield
+
+
+class StringArray(Sequence):
+    """
+    Read-only list of strings stored as one UTF-8 blob plus offsets, so it can be memory-mapped.
+    """
+
+    def __init__(self, blob, offsets):
+        self.blob = blob
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            start, stop, step = i.indices(len(self))
+            if step != 1:
+                return [self[j] for j in range(start, stop, step)]
+            if stop <= start:
+                return []
+            # a contiguous slice is one read of the blob, split in Python
+            offsets = self.offsets[start:stop + 1].tolist()
+            base = offsets[0]
+            data = bytes(self.blob[base:offsets[-1]])
+            return [data[begin - base:end - base].decode("utf-8") for begin, end in zip(offsets, offsets[1:])]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return bytes(self.blob[self.offsets[i]:self.offsets[i + 1]]).decode("utf-8")
+
+    @classmethod
+    def from_strings(cls, strings):
+        encoded = [s.encode("utf-8") for s in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(s) for s in encoded])
+        return cls(np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets)
+
+    def save(self, path, name):
+        np.save(os.path.join(path, f"{name}.blob.npy"), self.blob)
+        np.save(os.path.join(path, f"{name}.offsets.npy"), self.offsets)
+
+    @classmethod
+    def load(cls, path, name):
+        return cls(load_mapped(os.path.join(path, f"{name}.blob.npy")),
+                   load_mapped(os.path.join(path, f"{name}.offsets.npy")))
+
+
+class StringListMap(Mapping):
+    """
+    Read-only ``Dict[str, List[str]]`` over memory-mapped arrays. Keys are sorted and found by binary search.
+    """
+
+    def __init__(self, keys, value_offsets, values):
+        self.keys_array = keys
+        self.value_offsets = value_offsets
+        self.values_array = values
+
+    def __len__(self):
+        return len(self.keys_array)
+
+    def __iter__(self):
+        return iter(self.keys_array)
+
+    def _find(self, key):
+        low, high = 0, len(self.keys_array)
+        while low < high:
+            mid = (low + high) // 2
+            if self.keys_array[mid] < key:
+                low = mid + 1
+            else:
+                high = mid
+        if low < len(self.keys_array) and self.keys_array[low] == key:
+            return low
+        return None
+
+    def __contains__(self, key):
+        return isinstance(key, str) and self._find(key) is not None
+
+    def __getitem__(self, key):
+        i = self._find(key) if isinstance(key, str) else None
+        if i is None:
+            raise KeyError(key)
+        return self.values_array[int(self.value_offsets[i]):int(self.value_offsets[i + 1])]
+
+    @classmethod
+    def from_dict(cls, data):
+        keys = sorted(data)
+        value_offsets = np.zeros(len(keys) + 1, dtype=np.int64)
+        value_offsets[1:] = np.cumsum([len(data[key]) for key in keys])
+        values = [value for key in keys for value in data[key]]
+        return cls(StringArray.from_strings(keys), value_offsets, StringArray.from_strings(values))
+
+    def save(self, path, name):
+        self.keys_array.save(path, f"{name}.keys")
+        self.values_array.save(path, f"{name}.values")
+        np.save(os.path.join(path, f"{name}.value_offsets.npy"), self.value_offsets)
+
+    @classmethod
+    def load(cls, path, name):
+        return cls(StringArray.load(path, f"{name}.keys"),
+                   load_mapped(os.path.join(path, f"{name}.value_offsets.npy")),
+                   StringArray.load(path, f"{name}.values"))
+
+
+class SharedTables:
+    """
+    Large read-only tables published once into memory-mapped files and attached zero-copy by every worker.
+    All workers map the same files, so the operating system keeps a single copy in the page cache.
+
+    ``path`` is a symlink to the last published version. A version is written completely, its manifest
+    last, before the symlink is swapped to it, so files a worker has mapped are never rewritten.
+    """
+
+    def __init__(self, edit_distance, irrelevant_vocab):
+        self.edit_distance = edit_distance
+        self.irrelevant_vocab = irrelevant_vocab
+
+    @staticmethod
+    def sources():
+        from app.core.config import EDIT_DISTANCE_PATH, IRRELEVANT_WORD_PATH
+
+        return {EDIT_DISTANCE_TABLE: EDIT_DISTANCE_PATH, IRRELEVANT_VOCAB_TABLE: IRRELEVANT_WORD_PATH}
+
+    @staticmethod
+    def fingerprint(sources):
+        fingerprint = {"format": TABLES_FORMAT}
+        for name, file_path in sources.items():
+            stat = os.stat(file_path)
+            fingerprint[name] = [os.path.abspath(file_path), stat.st_mtime_ns, stat.st_size]
+        return fingerprint
+
+    @classmethod
+    def is_up_to_date(cls, path):
+        """
+        Whether ``path`` holds a completely published version built from the current source files.
+        """
+        manifest_path = os.path.join(path, MANIFEST_FILE)
+        if not os.path.exists(manifest_path):
+            return False
+        with open(manifest_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+        try:
+            return manifest == cls.fingerprint(cls.sources())
+        except FileNotFoundError:
+            return False
+
+    @classmethod
+    def publish(cls, path, force=False):
+        """
+        Publish the tables into ``path`` unless they are up to date; returns whether they were published.
+        """
+        from app.services.spelling.modules.word import EditDistanceHandler, InsertIrrelevantWordHandler
+
+        with publish_lock(path):
+            if not force and cls.is_up_to_date(path):
+                logger.info(f"Shared tables in {path} are up to date")
+                return False
+
+            sources = cls.sources()
+            version = f"{path}.{time.time_ns()}"
+            os.makedirs(version)
+            edit_distance = EditDistanceHandler.read(sources[EDIT_DISTANCE_TABLE])
+            StringListMap.from_dict(edit_distance).save(version, EDIT_DISTANCE_TABLE)
+            vocab = InsertIrrelevantWordHandler.read_vocab(sources[IRRELEVANT_VOCAB_TABLE])
+            StringArray.from_strings(vocab).save(version, IRRELEVANT_VOCAB_TABLE)
+            with open(os.path.join(version, MANIFEST_FILE), "w", encoding="utf-8") as f:
+                json.dump(cls.fingerprint(sources), f)
+
+            cls._swap(path, version)
+            logger.info(f"Shared tables published in {version}")
+        return True
+
+    @staticmethod
+    def _swap(path, version):
+        previous = os.path.realpath(path) if os.path.islink(path) else None
+        if os.path.isdir(path) and not os.path.islink(path):
+            # tables written in place by an older version of publish
+            shutil.rmtree(path)
+
+        link = f"{version}.link"
+        os.symlink(os.path.basename(version), link)
+        os.replace(link, path)
+        # workers that mapped the previous version keep their files until they exit
+        if previous and os.path.isdir(previous):
+            shutil.rmtree(previous)
+
+    @classmethod
+    def attach(cls, path):
+        if not cls.is_up_to_date(path):
+            if os.path.exists(path):
+                logger.warning(f"Shared tables in {path} are incomplete or stale, loading private copies")
+            return None
+
+        path = os.path.realpath(path)
+        return cls(StringListMap.load(path, EDIT_DISTANCE_TABLE), StringArray.load(path, IRRELEVANT_VOCAB_TABLE))
+
+
+if __name__ == "__main__":
+    from app.core.config import SHARED_TABLES_PATH
+
+    parser = argparse.ArgumentParser(description="Publish read-only tables as memory-mapped files for all workers")
+    parser.add_argument("--output", default=SHARED_TABLES_PATH)
+    parser.add_argument("--force", action="store_true", help="Publish even if the tables are up to date")
+    args = parser.parse_args()
+
+    SharedTables.publish(args.output, force=args.force)
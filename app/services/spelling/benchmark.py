@@ -0,0 +1,80 @@
+import argparse
+import time
+
+import numpy as np
+
+from app.services.benchmark_data import load_sentences
+from app.services.spelling.modules.base_module import default_tokenizer
+from app.services.spelling.modules.typo import TelexHandler, VNIHandler, KeyboardHandler
+from app.services.spelling.modules.accent import MissingDialectHandler, NoDialectHandler, WrongDialectHandler
+from app.services.spelling.modules.spelling_replacement import (
+    SpellingReplacementBeginHandler,
+    SpellingReplacementFinalHandler
+)
+from app.services.spelling.modules.word import DuplicateWordHandler, InsertIrrelevantWordHandler, EditDistanceHandler
+from app.services.spelling.modules.char import (
+    RandomCharHandler,
+    SubstituteHandler,
+    MisspellVowelHandler,
+    DuplicateHandler,
+    WhitespaceHandler
+)
+
+
+def load_handlers(edit_distance_path, irrelevant_word_path):
+    word_kwargs = dict(aug_p=1, aug_min=1, aug_max=2)
+    char_kwargs = dict(aug_word_p=1, aug_word_min=1, aug_word_max=2)
+    return {
+        "telex": TelexHandler(**char_kwargs),
+        "vni": VNIHandler(**char_kwargs),
+        "keyboard": KeyboardHandler(**char_kwargs),
+        "missing_dialect": MissingDialectHandler(**char_kwargs),
+        "no_dialect": NoDialectHandler(**char_kwargs),
+        "wrong_dialect": WrongDialectHandler(**char_kwargs),
+        "spelling_begin": SpellingReplacementBeginHandler(tokenizer=default_tokenizer, aug_char_p=0.6, **char_kwargs),
+        "spelling_final": SpellingReplacementFinalHandler(tokenizer=default_tokenizer, aug_char_p=0.6, **char_kwargs),
+        "duplicate_word": DuplicateWordHandler(**word_kwargs),
+        "insert_irrelevant": InsertIrrelevantWordHandler(file_path=irrelevant_word_path, **word_kwargs),
+        "edit_distance": EditDistanceHandler(dict_path=edit_distance_path, **word_kwargs),
+        "random_char": RandomCharHandler(**char_kwargs),
+        "substitute_char": SubstituteHandler(tokenizer=default_tokenizer, aug_char_p=0.1, **char_kwargs),
+        "misspell_vowel": MisspellVowelHandler(**char_kwargs),
+        "duplicate_char": DuplicateHandler(**char_kwargs),
+        "whitespace": WhitespaceHandler(**char_kwargs),
+    }
+
+
+def run(handler, sentences, repeat):
+    latencies = []
+    for _ in range(repeat):
+        for sentence in sentences:
+            start = time.perf_counter()
+            handler.augment(sentence)
+            latencies.append((time.perf_counter() - start) * 1e6)
+    return np.array(latencies)
+
+
+def main():
+    from app.core.config import EDIT_DISTANCE_PATH, IRRELEVANT_WORD_PATH
+
+    parser = argparse.ArgumentParser(description="Per-call overhead of every spelling augmenter")
+    parser.add_argument("--data", default=None, help="Text file with one sentence per line")
+    parser.add_argument("--edit-distance", default=EDIT_DISTANCE_PATH)
+    parser.add_argument("--irrelevant-words", default=IRRELEVANT_WORD_PATH)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    handlers = load_handlers(args.edit_distance, args.irrelevant_words)
+    print(f"loaded {len(handlers)} augmenters in {time.perf_counter() - start:.2f}s")
+
+    sentences = load_sentences(args.data)
+    for name, handler in handlers.items():
+        run(handler, sentences[:1], 10)
+        latencies = run(handler, sentences, args.repeat)
+        print(f"{name}: mean {latencies.mean():.1f}us, p50 {np.percentile(latencies, 50):.1f}us, "
+              f"p99 {np.percentile(latencies, 99):.1f}us over {len(latencies)} calls")
+
+
+if __name__ == "__main__":
+    main()
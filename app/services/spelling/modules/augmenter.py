@@ -0,0 +1,249 @@
+import copy
+import math
+import re
+import string
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+import app.services.spelling.utils as utils
+from app.services.utils import tokenize
+
+DETOKENIZER_REGEXS = [
+    (re.compile(r'\s([.,:;?!%]+)([ \'"`])'), r'\1\2'),  # End of sentence
+    (re.compile(r'\s([.,:;?!%]+)$'), r'\1'),  # End of sentence
+    (re.compile(r'\s([\[\(\{\<])\s'), r' \g<1>'),  # Left bracket
+    (re.compile(r'\s([\]\)\}\>])\s'), r'\g<1> '),  # Right bracket
+]
+
+
+def detokenize(tokens):
+    text = ' '.join(tokens)
+    for regex, sub in DETOKENIZER_REGEXS:
+        text = regex.sub(sub, text)
+    return text.strip()
+
+
+class AugmentConfig(NamedTuple):
+    """
+    Parameters of one augmentation request. ``exclude`` tokens are never augmented and ``aug_char_p``
+    keeps the augmenter's own value when it is None.
+    """
+    p_aug: float
+    min_aug: int
+    max_aug: int
+    exclude: frozenset = frozenset()
+    aug_char_p: Optional[float] = None
+
+
+class Analysis(NamedTuple):
+    """
+    The part of an augmentation shared by every variant drawn from one text: its tokens and their spans,
+    the indexes that may be augmented and the number of units the augmentation count is a fraction of.
+    """
+    data: str
+    tokens: list
+    spans: Optional[list]
+    candidates: list
+    size: int
+
+
+class SpellingAugmenter:
+    """
+    Minimal base of the spelling augmenters: set-based index selection and sampling.
+
+    Randomness comes from the generator passed to ``augment`` or, by default, from the instance's own
+    generator, so the global ``random``/``numpy.random`` state is never used. Change tracking is only
+    done when ``include_detail`` is set, in which case every result is a ``(text, changes)`` pair.
+
+    A text is analyzed once by ``analyze`` and the action draws each of the ``n`` variants from that analysis.
+    """
+
+    def __init__(self, name, action, tokenizer=None, reverse_tokenizer=None, stopwords=None, stopwords_regex=None,
+                 include_special_char=True, include_detail=False, verbose=0, seed=None):
+        self.name = name
+        self.action = action
+        self.tokenizer = tokenizer or tokenize
+        self.reverse_tokenizer = reverse_tokenizer or detokenize
+        self.stopwords = stopwords
+        self.stopwords_regex = re.compile(stopwords_regex) if stopwords_regex else None
+        self.include_special_char = include_special_char
+        self.include_detail = include_detail
+        self.verbose = verbose
+        self.rng = np.random.default_rng(seed)
+
+    def augment(self, data, n=1, rng=None):
+        if not data:
+            return []
+        rng = self.rng if rng is None else rng
+        action_fx = getattr(self, self.action)
+        analysis = self.analyze(data.strip())
+        return [action_fx(analysis, rng) for _ in range(n)]
+
+    def analyze(self, data):
+        tokens = self.tokenizer(data)
+        return Analysis(data, tokens, utils.token_spans(data, tokens), self.get_candidates(tokens), len(tokens))
+
+    def get_candidates(self, tokens):
+        return self.skip_aug(self.pre_skip_aug(tokens), tokens)
+
+    def configure(self, config):
+        """
+        A copy of this augmenter using the parameters of ``config``. The copy shares the loaded tables and
+        this augmenter is never modified, so one instance can serve concurrent requests.
+        """
+        augmenter = copy.copy(self)
+        augmenter._apply_config(config)
+        return augmenter
+
+    def _apply_config(self, config):
+        if config.exclude:
+            self.stopwords = frozenset(config.exclude).union(self.stopwords or ())
+
+    @staticmethod
+    def token2char(word):
+        return list(word)
+
+    @staticmethod
+    def choice(candidates, rng):
+        return candidates[int(rng.random() * len(candidates))]
+
+    @staticmethod
+    def sample(candidates, num, rng):
+        return [candidates[i] for i in rng.permutation(len(candidates))[:num]]
+
+    @staticmethod
+    def _generate_aug_cnt(size, aug_min, aug_max, aug_p):
+        cnt = int(math.ceil((aug_p if aug_p is not None else 0.3) * size))
+        if aug_min and cnt < aug_min:
+            return aug_min
+        if aug_max and cnt > aug_max:
+            return aug_max
+        return cnt
+
+    @staticmethod
+    def _select(idxes, aug_cnt, rng):
+        if aug_cnt >= len(idxes):
+            return set(idxes)
+        return {idxes[i] for i in rng.permutation(len(idxes))[:aug_cnt]}
+
+    def _is_skipped(self, token):
+        if token in string.punctuation and not self.include_special_char:
+            return True
+        if self.stopwords is not None and token in self.stopwords:
+            return True
+        return self.stopwords_regex is not None and (
+                self.stopwords_regex.match(token) or self.stopwords_regex.match(' ' + token + ' ') or
+                self.stopwords_regex.match(' ' + token) or self.stopwords_regex.match(token + ' '))
+
+    def pre_skip_aug(self, tokens):
+        return [token_idx for token_idx, token in enumerate(tokens) if not self._is_skipped(token)]
+
+    def skip_aug(self, token_idxes, tokens):
+        return token_idxes
+
+    def _output(self, analysis, results, keep_spacing=True):
+        """
+        Rebuild the text from the augmented tokens, with the list of changed tokens if it is requested.
+        The original spacing is kept unless ``keep_spacing`` is False, then the tokens are detokenized.
+        """
+        if keep_spacing:
+            text = utils.join_spans(analysis.data, analysis.spans, results)
+        else:
+            text = self.reverse_tokenizer(results)
+        if not self.include_detail:
+            return text
+        changes = [dict(orig_token_pos=token_i, orig_token=token, new_token=result, action=self.action)
+                   for token_i, (token, result) in enumerate(zip(analysis.tokens, results)) if token != result]
+        return text, changes
+
+
+class CharSpellingAugmenter(SpellingAugmenter):
+    def __init__(self, name, action, min_char=2, aug_char_min=1, aug_char_max=10, aug_char_p=0.3,
+                 aug_word_min=1, aug_word_max=10, aug_word_p=0.3, tokenizer=None, reverse_tokenizer=None,
+                 stopwords=None, verbose=0, stopwords_regex=None, include_special_char=True, include_detail=False,
+                 seed=None):
+        super().__init__(name=name, action=action, tokenizer=tokenizer, reverse_tokenizer=reverse_tokenizer,
+                         stopwords=stopwords, stopwords_regex=stopwords_regex,
+                         include_special_char=include_special_char, include_detail=include_detail, verbose=verbose,
+                         seed=seed)
+        self.min_char = min_char
+        self.aug_char_min = aug_char_min
+        self.aug_char_max = aug_char_max
+        self.aug_char_p = aug_char_p
+        self.aug_word_min = aug_word_min
+        self.aug_word_max = aug_word_max
+        self.aug_word_p = aug_word_p
+
+    def _apply_config(self, config):
+        super()._apply_config(config)
+        self.aug_word_p = config.p_aug
+        self.aug_word_min = config.min_aug
+        self.aug_word_max = config.max_aug
+        if config.aug_char_p:
+            self.aug_char_p = config.aug_char_p
+
+    def pre_skip_aug(self, tokens):
+        return [token_idx for token_idx, token in enumerate(tokens)
+                if len(token) >= self.min_char and not self._is_skipped(token)]
+
+    def get_candidates(self, tokens):
+        # ``skip_aug`` filters the characters of a word here, see ``_get_aug_char_idxes``
+        return self.pre_skip_aug(tokens)
+
+    def _get_aug_word_idxes(self, analysis, rng):
+        if not analysis.candidates:
+            return set()
+        aug_cnt = self._generate_aug_cnt(analysis.size, self.aug_word_min, self.aug_word_max, self.aug_word_p)
+        return self._select(analysis.candidates, aug_cnt, rng)
+
+    def _get_aug_char_idxes(self, chars, rng):
+        idxes = self.skip_aug(list(range(len(chars))), chars)
+        if not idxes:
+            return set()
+        return self._select(idxes, self._generate_aug_cnt(len(chars), self.aug_char_min, self.aug_char_max,
+                                                          self.aug_char_p), rng)
+
+
+class WordSpellingAugmenter(SpellingAugmenter):
+    def __init__(self, name, action, aug_min=1, aug_max=10, aug_p=0.3, stopwords=None, tokenizer=None,
+                 reverse_tokenizer=None, stopwords_regex=None, verbose=0, include_detail=False, seed=None):
+        super().__init__(name=name, action=action, tokenizer=tokenizer, reverse_tokenizer=reverse_tokenizer,
+                         stopwords=stopwords, stopwords_regex=stopwords_regex, include_special_char=False,
+                         include_detail=include_detail, verbose=verbose, seed=seed)
+        self.aug_min = aug_min
+        self.aug_max = aug_max
+        self.aug_p = aug_p
+
+    def _apply_config(self, config):
+        super()._apply_config(config)
+        self.aug_p = config.p_aug
+        self.aug_min = config.min_aug
+        self.aug_max = config.max_aug
+
+    def generate_aug_cnt(self, size):
+        return self._generate_aug_cnt(size, self.aug_min, self.aug_max, self.aug_p) if size else 0
+
+    def _get_aug_idxes(self, analysis, rng):
+        return self._select(analysis.candidates, self.generate_aug_cnt(analysis.size), rng)
+
+    def align_capitalization(self, src_token, dest_token):
+        if self.get_word_case(src_token) == 'capitalize' and self.get_word_case(dest_token) == 'lower':
+            return dest_token.capitalize()
+        return dest_token
+
+    @staticmethod
+    def get_word_case(word):
+        if len(word) == 0:
+            return 'empty'
+        if len(word) == 1 and word.isupper():
+            return 'capitalize'
+        if word.isupper():
+            return 'upper'
+        if word.islower():
+            return 'lower'
+        if any(c.isupper() for c in word[1:]):
+            return 'mixed'
+        if word[0].isupper():
+            return 'capitalize'
+        return 'unknown'
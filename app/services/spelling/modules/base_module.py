@@ -1,15 +1,12 @@
 import string
-import re
 from abc import ABC
 
-import numpy as np
-import numpy.random as random
-import nlpaug.augmenter.char as nac
-from nlpaug.util import Method
+from app.core.config import TYPO_TABLE_PATH
+from app.services.spelling.modules.augmenter import Analysis, CharSpellingAugmenter
+from app.services.spelling.modules.char_table import CharTable
+from app.services.spelling.modules.typo_table import load_typo_table
+from app.services.utils import tokenize
 
-import app.services.spelling.utils as utils
-
-TOKENIZER_REGEX = re.compile(r'(\W)')
 COMPOSITION_CHARS = ['á', 'à', 'ạ', 'ả', 'ã', 'â', 'ấ', 'ầ', 'ậ', 'ẩ', 'ẫ', 'ă', 'ắ', 'ằ', 'ặ', 'ẳ',
                      'ẵ', 'í', 'ì', 'ỉ', 'ĩ', 'ị', 'ú', 'ù', 'ủ', 'ũ', 'ụ', 'ư', 'ứ', 'ừ', 'ử', 'ữ',
                      'ự', 'é', 'è', 'ẻ', 'ẽ', 'ẹ', 'ê', 'ế', 'ề', 'ể', 'ễ', 'ệ', 'ó', 'ò', 'ỏ', 'õ',
@@ -19,14 +16,16 @@ punctuation = string.punctuation
 
 
 def default_tokenizer(text):
-    tokens = TOKENIZER_REGEX.split(text)
-    return [t for t in tokens if len(t.strip()) > 0]
+    return tokenize(text)
     # tokenized_lst = text.split(seperator)
     # tokenized_lst = list(filter(lambda token: token != '', tokenized_lst))
     # return tokenized_lst
 
 
-class TypoAugmenter(nac.CharAugmenter, ABC):
+class TypoAugmenter(CharSpellingAugmenter, ABC):
+    DECOMPOSE_TWICE_PROB = 0.50
+    typo_table_name = None
+
     def __init__(self, name='TypoAugmenter', min_char=2, aug_char_min=1, aug_char_max=10, aug_char_p=0.3,
                  aug_word_min=1, aug_word_max=10, aug_word_p=0.3, tokenizer=None, reverse_tokenizer=None,
                  stopwords=None, verbose=0, stopwords_regex=None):
@@ -34,10 +33,12 @@ class TypoAugmenter(nac.CharAugmenter, ABC):
             name=name, action="substitute", min_char=min_char, aug_char_min=aug_char_min,
             aug_char_max=aug_char_max, aug_char_p=aug_char_p, aug_word_min=aug_word_min,
             aug_word_max=aug_word_max, aug_word_p=aug_word_p, tokenizer=tokenizer,
-            reverse_tokenizer=reverse_tokenizer, stopwords=stopwords, device='cpu',
+            reverse_tokenizer=reverse_tokenizer, stopwords=stopwords,
             verbose=verbose, stopwords_regex=stopwords_regex)
         self.typo = {}
         self.eligibleCharacters = COMPOSITION_CHARS
+        self.variant_table = load_typo_table(TYPO_TABLE_PATH, self.typo_table_name) \
+            if self.typo_table_name else None
 
     def _is_typo(self, character):
         return character in self.typo
@@ -45,9 +46,9 @@ class TypoAugmenter(nac.CharAugmenter, ABC):
     def _word_is_decomposable(self, word):
         return any(map(self._is_typo, word.lower()))
 
-    @staticmethod
-    def _random_decompose_twice():
-        return np.random.uniform() < 0.50
+    @classmethod
+    def _random_decompose_twice(cls, rng):
+        return rng.random() < cls.DECOMPOSE_TWICE_PROB
 
     @staticmethod
     def _generate_cdf(length):
@@ -80,21 +81,14 @@ class TypoAugmenter(nac.CharAugmenter, ABC):
             list_of_chars[index] = list_of_chars[0]
             list_of_chars[index + 1] = list_of_chars[1]
 
-    def substitute(self, data):
-        results = []
-        tokens = self.tokenizer(data)
-        gaps = utils.find_all_gaps(data, tokens)
-        temp = [tok if self._word_is_decomposable(tok) else '' for tok in tokens]
-        aug_word_idxes = self._get_aug_idxes(temp,
-                                             self.aug_word_min, self.aug_word_max,
-                                             self.aug_word_p, Method.WORD)
-        for token_i, token in enumerate(tokens):
-            if token_i not in aug_word_idxes:
-                results.append(token)
-                continue
-            result = self.generate_word_error(token)
-            results.append(result)
-        return utils.reverse_tokenizer(results, gaps)
+    def get_candidates(self, tokens):
+        return [token_i for token_i in self.pre_skip_aug(tokens) if self._word_is_decomposable(tokens[token_i])]
+
+    def substitute(self, analysis, rng):
+        aug_word_idxes = self._get_aug_word_idxes(analysis, rng)
+        results = [self.generate_word_error(token, rng) if token_i in aug_word_idxes else token
+                   for token_i, token in enumerate(analysis.tokens)]
+        return self._output(analysis, results)
 
     @staticmethod
     def recasing(telex_char, base_word, comp_word):
@@ -112,8 +106,11 @@ class TypoAugmenter(nac.CharAugmenter, ABC):
 
         return base_word, comp_word
 
-    def generate_word_error(self, word):
-        # if not word[0].isalpha(): return word
+    def _decompose(self, word):
+        """
+        Characters of ``word`` with the index, original text and typo decomposition of its first
+        decomposable character, None when there is nothing to decompose.
+        """
         list_chars = [w for w in word]
         if self._contains_uo(word):
             index = list_chars.index('ư') if "ư" in list_chars \
@@ -121,39 +118,88 @@ class TypoAugmenter(nac.CharAugmenter, ABC):
 
             telex_char = ''.join(list_chars[index:index + 2])
             if telex_char.lower() not in ['ươ', 'ướ', 'ườ', 'ưở', 'ượ', "ưỡ"]:
-                return word
-            base_word, comp_word = self.typo[telex_char.lower()][0], self.typo[telex_char.lower()][1:]
+                return None
         else:
             index, telex_char = next(((i, c) for i, c in enumerate(list_chars) if self._is_typo(c.lower())),
                                      (None, None))
             if not telex_char:
-                return ''.join(list_chars)
-            base_word, comp_word = self.typo[telex_char.lower()][0], self.typo[telex_char.lower()][1:]
+                return None
+        base_word, comp_word = self.typo[telex_char.lower()][0], self.typo[telex_char.lower()][1:]
+        return list_chars, index, telex_char, base_word, comp_word
 
-        is_decomposed_twice = len(comp_word) != 1 and self._random_decompose_twice()
+    def _compose(self, list_chars, index, telex_char, base_word, comp_word, is_decomposed_twice):
         if not is_decomposed_twice:
             base_word, comp_word = self._get_new_decomposition(base_word, comp_word)
         base_word, comp_word = self.recasing(telex_char, base_word, comp_word)
         self._insert_base_word(list_chars, index, base_word)
-        if comp_word:
-            self._insert_random(list_chars, index, base_word, comp_word[0])
-            if is_decomposed_twice:
-                self._insert_random(list_chars, index, base_word, comp_word[1])
+        return base_word, comp_word[:2] if is_decomposed_twice else comp_word[:1]
+
+    def generate_word_error(self, word, rng=None):
+        rng = self.rng if rng is None else rng
+        if self.variant_table is not None:
+            variant = self.variant_table.sample(word, rng.random())
+            if variant is not None:
+                return variant
+
+        # if not word[0].isalpha(): return word
+        decomposition = self._decompose(word)
+        if decomposition is None:
+            return word
+        list_chars, index, telex_char, base_word, comp_word = decomposition
+
+        is_decomposed_twice = len(comp_word) != 1 and self._random_decompose_twice(rng)
+        base_word, comp_word = self._compose(list_chars, index, telex_char, base_word, comp_word,
+                                             is_decomposed_twice)
+        for telex_character in comp_word:
+            self._insert_random(list_chars, index, base_word, telex_character, rng)
         result = ''.join(list_chars)
 
         return result
 
-    def _insert_random(self, list_chars, index_base, base_character, telex_character):
+    def enumerate_word_errors(self, word):
+        """
+        Every string ``generate_word_error`` can return for ``word``, mapped to its probability.
+        """
+        decomposition = self._decompose(word)
+        if decomposition is None:
+            return {word: 1.0}
+        list_chars, index, telex_char, base_word, comp_word = decomposition
+
+        branches = [(False, 1.0)] if len(comp_word) == 1 else \
+            [(False, 1 - self.DECOMPOSE_TWICE_PROB), (True, self.DECOMPOSE_TWICE_PROB)]
+        errors = {}
+        for is_decomposed_twice, branch_prob in branches:
+            chars = list(list_chars)
+            base, comp = self._compose(chars, index, telex_char, base_word, comp_word, is_decomposed_twice)
+            outcomes = [(chars, branch_prob)]
+            for telex_character in comp:
+                outcomes = [(self._insert_at(list(chars), index_to_insert, telex_character), prob * insert_prob)
+                            for chars, prob in outcomes
+                            for index_to_insert, insert_prob in zip(*self._insertion_points(chars, index, base))]
+            for chars, prob in outcomes:
+                error = ''.join(chars)
+                errors[error] = errors.get(error, 0.0) + prob
+        return errors
+
+    def _insertion_points(self, list_chars, index_base, base_character):
         possible_indices = list(range(index_base + int(len(base_character) == 2), len(list_chars) + 2))
-        cdf = self._generate_cdf(len(possible_indices))
-        index_to_insert = np.random.choice(possible_indices, p=cdf)
+        return possible_indices, self._generate_cdf(len(possible_indices))
+
+    @staticmethod
+    def _insert_at(list_chars, index_to_insert, telex_character):
         if index_to_insert == len(list_chars):
             list_chars.append(telex_character)
         else:
             list_chars[index_to_insert:index_to_insert] = telex_character
+        return list_chars
 
+    def _insert_random(self, list_chars, index_base, base_character, telex_character, rng):
+        possible_indices, cdf = self._insertion_points(list_chars, index_base, base_character)
+        index_to_insert = possible_indices[rng.choice(len(possible_indices), p=cdf)]
+        self._insert_at(list_chars, index_to_insert, telex_character)
 
-class AccentAugmenter(nac.CharAugmenter, ABC):
+
+class AccentAugmenter(CharSpellingAugmenter, ABC):
     def __init__(self, name='AccentAugmenter', min_char=2, aug_char_p=0.3,
                  aug_word_min=1, aug_word_max=100, aug_word_p=0.3, tokenizer=None, reverse_tokenizer=None,
                  stopwords=None, verbose=0, stopwords_regex=None):
@@ -161,43 +207,36 @@ class AccentAugmenter(nac.CharAugmenter, ABC):
             name=name, action="substitute", min_char=min_char, aug_char_min=1,
             aug_char_max=10, aug_char_p=aug_char_p, aug_word_min=aug_word_min,
             aug_word_max=aug_word_max, aug_word_p=aug_word_p, tokenizer=tokenizer,
-            reverse_tokenizer=reverse_tokenizer, stopwords=stopwords, device='cpu',
+            reverse_tokenizer=reverse_tokenizer, stopwords=stopwords,
             verbose=verbose, stopwords_regex=stopwords_regex)
         self.eligibleCharacters = COMPOSITION_CHARS
         self.model = {}
+        self._char_table = None
+
+    @property
+    def char_table(self):
+        # subclasses fill in the model after this constructor, so the table is compiled on first use
+        if self._char_table is None or self._char_table.model is not self.model:
+            self._char_table = CharTable(self.model, self.eligibleCharacters)
+        return self._char_table
+
+    def configure(self, config):
+        # compile the table before copying, so that every configured copy shares it
+        _ = self.char_table
+        return super().configure(config)
 
     def _word_is_eligible(self, word):
-        return any(map(lambda x: x.lower() in self.eligibleCharacters, word))
+        return self.char_table.is_eligible(word)
 
-    def substitute(self, data):
-        results = []
-        tokens = self.tokenizer(data)
-        gaps = utils.find_all_gaps(data, tokens)
-        temp = [tok if self._word_is_eligible(tok) else '' for tok in tokens]
-        aug_word_idxes = self._get_aug_idxes(temp, self.aug_word_min, self.aug_word_max, self.aug_word_p, Method.WORD)
-        for token_i, token in enumerate(tokens):
-            if token_i not in aug_word_idxes:
-                results.append(token)
-                continue
-
-            result = ''
-            chars = self.token2char(token)
-            for char in chars:
-                lchar = char.lower()
-                if lchar not in self.eligibleCharacters:
-                    result += char
-                    continue
-                if random.random() < self.aug_char_p:
-                    eligible_replacement = self.model[lchar]
-                    if char.isupper():
-                        eligible_replacement = [c.upper() for c in eligible_replacement]
-                    result += self.sample(eligible_replacement, 1)[0]
-                else:
-                    result += char
+    def get_candidates(self, tokens):
+        return [token_i for token_i in self.pre_skip_aug(tokens) if self._word_is_eligible(tokens[token_i])]
 
-            results.append(result)
+    def substitute(self, analysis, rng):
+        aug_word_idxes = self._get_aug_word_idxes(analysis, rng)
+        results = [self.char_table.apply(token, self.aug_char_p, rng) if token_i in aug_word_idxes else token
+                   for token_i, token in enumerate(analysis.tokens)]
 
-        return utils.reverse_tokenizer(results, gaps)
+        return self._output(analysis, results)
 
 
 finalConsonant = ['i', 'y', 'c', 't', 'n', 'ng', 'nh']
@@ -205,7 +244,9 @@ beginConsonant = ['x', 's', 'd', 'đ', 'c', 'k', 'ngh', 'ng', 'gh', 'g', 'gi', '
                   'qu', 'u', 'v', 'nh']
 
 
-class SpellingReplacementAugmenter(nac.CharAugmenter, ABC):
+class SpellingReplacementAugmenter(CharSpellingAugmenter, ABC):
+    mode = None
+
     def __init__(self, name='SpellingReplacementAugmenter', min_char=2, aug_char_p=0.3,
                  aug_word_min=1, aug_word_max=100, aug_word_p=0.3, tokenizer=None, reverse_tokenizer=None,
                  stopwords=None, verbose=0, stopwords_regex=None):
@@ -213,7 +254,7 @@ class SpellingReplacementAugmenter(nac.CharAugmenter, ABC):
             name=name, action="substitute", min_char=min_char, aug_char_min=1,
             aug_char_max=10, aug_char_p=aug_char_p, aug_word_min=aug_word_min,
             aug_word_max=aug_word_max, aug_word_p=aug_word_p, tokenizer=tokenizer,
-            reverse_tokenizer=reverse_tokenizer, stopwords=stopwords, device='cpu',
+            reverse_tokenizer=reverse_tokenizer, stopwords=stopwords,
             verbose=verbose, stopwords_regex=stopwords_regex)
         self.begin_consonant = {
             "x": ["s"],
@@ -264,10 +305,10 @@ class SpellingReplacementAugmenter(nac.CharAugmenter, ABC):
                 return True
         return False
 
-    def sample_uppercase(self, word, mode):
+    def sample_uppercase(self, word, mode, rng):
         result = ''
         if mode == 'begin':
-            prefix = self.sample(self.begin_consonant[word.lower()], 1)[0]
+            prefix = self.choice(self.begin_consonant[word.lower()], rng)
             if word.isupper():
                 result += prefix.upper()
             elif word[0].isupper():
@@ -277,27 +318,27 @@ class SpellingReplacementAugmenter(nac.CharAugmenter, ABC):
             else:
                 result += prefix
         else:
-            prefix = self.sample(self.final_consonant[word.lower()], 1)[0]
+            prefix = self.choice(self.final_consonant[word.lower()], rng)
             if word.isupper():
                 result += prefix.upper()
             else:
                 result += prefix
         return result
 
-    def substitute_data(self, data, mode):
+    def analyze(self, data):
         tokens = self.tokenizer(data)
-        new_tokens = []
-        index_new_tokens = []
-        for token_i, token in enumerate(tokens):
-            if self.check_pos_consonant(token.lower(), mode):
-                new_tokens.append(token)
-                index_new_tokens.append(token_i)
-        if new_tokens:
-            aug_word_idxes = self._get_aug_idxes(new_tokens, self.aug_word_min, self.aug_word_max, self.aug_word_p,
-                                                 Method.WORD)
-            for token_i, token in enumerate(new_tokens):
-                if token_i not in aug_word_idxes:
-                    continue
+        # the augmented words are drawn among the words with a consonant at the position of ``mode``
+        consonant_idxes = [token_i for token_i, token in enumerate(tokens)
+                           if self.check_pos_consonant(token.lower(), self.mode)]
+        candidates = [consonant_idxes[i] for i in self.pre_skip_aug([tokens[i] for i in consonant_idxes])]
+        return Analysis(data, tokens, None, candidates, len(consonant_idxes))
+
+    def substitute(self, analysis, rng):
+        mode = self.mode
+        tokens = list(analysis.tokens)
+        if analysis.size:
+            for token_i in sorted(self._get_aug_word_idxes(analysis, rng)):
+                token = tokens[token_i]
                 result = ''
                 if mode == 'begin':
                     if any(char.isalpha() for char in token):
@@ -305,16 +346,16 @@ class SpellingReplacementAugmenter(nac.CharAugmenter, ABC):
                             result += token[0]
                             token = token[1:]
                     if token[:3].lower() in beginConsonant:
-                        if np.random.random() < self.aug_char_p:
-                            result += self.sample_uppercase(token[:3], mode)
+                        if rng.random() < self.aug_char_p:
+                            result += self.sample_uppercase(token[:3], mode, rng)
                             result += token[3:]
                     elif token[:2].lower() in beginConsonant:
-                        if np.random.random() < self.aug_char_p:
-                            result = self.sample_uppercase(token[:2], mode)
+                        if rng.random() < self.aug_char_p:
+                            result = self.sample_uppercase(token[:2], mode, rng)
                             result += token[2:]
                     else:
-                        if np.random.random() < self.aug_char_p:
-                            result = self.sample_uppercase(token[:1], mode)
+                        if rng.random() < self.aug_char_p:
+                            result = self.sample_uppercase(token[:1], mode, rng)
                             result += token[1:]
                 else:
                     end_consonants = ''
@@ -323,14 +364,14 @@ class SpellingReplacementAugmenter(nac.CharAugmenter, ABC):
                             end_consonants += token[-1]
                             token = token[:-1]
                     if token[-2:].lower() in finalConsonant:
-                        if np.random.random() < self.aug_char_p:
-                            result = token[:-2] + self.sample_uppercase(token[-2:], mode) + end_consonants
+                        if rng.random() < self.aug_char_p:
+                            result = token[:-2] + self.sample_uppercase(token[-2:], mode, rng) + end_consonants
                     else:
-                        if np.random.random() < self.aug_char_p:
-                            result = token[:-1] + self.sample_uppercase(token[-1], mode) + end_consonants
+                        if rng.random() < self.aug_char_p:
+                            result = token[:-1] + self.sample_uppercase(token[-1], mode, rng) + end_consonants
 
                 if result:
-                    tokens[index_new_tokens[token_i]] = result
+                    tokens[token_i] = result
 
-            return self.reverse_tokenizer(tokens)
-        return data
+            return self._output(analysis, tokens, keep_spacing=False)
+        return analysis.data
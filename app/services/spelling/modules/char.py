@@ -1,18 +1,21 @@
+import bisect
 import re
 import string
 from abc import ABC
 
-import numpy as np
-import numpy.random as random
-import nlpaug.augmenter.char as nac
-from nlpaug.util import Action, Method, Doc
-
 import app.services.spelling.utils as utils
+from app.services.spelling.modules.augmenter import Analysis, CharSpellingAugmenter
 from app.services.spelling.modules.base_module import COMPOSITION_CHARS
+from app.services.spelling.modules.char_table import CharTable
 from app.services.spelling.modules.typo import TelexHandler
 
+WHITESPACE_REGEX = re.compile(r'\s+')
+# a whitespace between two words, i.e. with neither a punctuation nor another whitespace on its sides
+WORD_CHAR = rf'[^\s{re.escape(string.punctuation)}]'
+MERGEABLE_WHITESPACE_REGEX = re.compile(rf'(?<={WORD_CHAR})\s+(?={WORD_CHAR})')
+
 
-class RandomCharHandler(nac.CharAugmenter, ABC):
+class RandomCharHandler(CharSpellingAugmenter, ABC):
     def __init__(self, name='MyRandomCharAugmenter', min_char=2, aug_char_min=1, aug_char_max=10, aug_char_p=0.3,
                  aug_word_min=1, aug_word_max=10, aug_word_p=0.3, tokenizer=None, reverse_tokenizer=None,
                  stopwords=None, verbose=0, stopwords_regex=None):
@@ -20,46 +23,67 @@ class RandomCharHandler(nac.CharAugmenter, ABC):
             name=name, action="substitute", min_char=min_char, aug_char_min=aug_char_min,
             aug_char_max=aug_char_max, aug_char_p=aug_char_p, aug_word_min=aug_word_min,
             aug_word_max=aug_word_max, aug_word_p=aug_word_p, tokenizer=tokenizer,
-            reverse_tokenizer=reverse_tokenizer, stopwords=stopwords, device='cpu',
+            reverse_tokenizer=reverse_tokenizer, stopwords=stopwords,
             verbose=verbose, stopwords_regex=stopwords_regex)
         self.telexDecomposer = TelexHandler()
+        self.duplicator = DuplicateHandler(aug_word_p=1, min_char=min_char, aug_char_min=aug_char_min,
+                                           aug_char_max=aug_char_max, aug_char_p=aug_char_p)
         self.randomizers = [
-            DuplicateHandler(aug_word_p=1, min_char=min_char, aug_char_min=aug_char_min, aug_char_max=aug_char_max,
-                             aug_char_p=aug_char_p),
-            nac.RandomCharAug(action="delete", aug_word_p=1, min_char=min_char, aug_char_min=aug_char_min,
-                              aug_char_max=aug_char_max, aug_char_p=aug_char_p),
-            nac.RandomCharAug(action="swap", aug_word_p=1, min_char=min_char, aug_char_min=aug_char_min,
-                              aug_char_max=aug_char_max, aug_char_p=aug_char_p),
-            nac.RandomCharAug(action="insert", aug_word_p=1, min_char=min_char,
-                              aug_char_min=aug_char_min, aug_char_max=aug_char_max,
-                              aug_char_p=aug_char_p, include_upper_case=False, spec_char="",
-                              include_numeric=False)
-            #   nac.RandomCharAug(action="substitute", aug_word_p=1, min_char=3),
+            self.duplicator.duplicate_chars,
+            self.delete_chars,
+            self.swap_chars,
+            self.insert_chars
+            #   self.substitute_chars,
         ]
         self.pdf = [0.4, 0.3, 0.2, 0.1]
-
-    def substitute(self, data):
+        self.candidates = string.ascii_lowercase
+
+    def delete_chars(self, token, rng):
+        chars = self.token2char(token)
+        for char_i in sorted(self._get_aug_char_idxes(chars, rng), reverse=True):
+            del chars[char_i]
+        return ''.join(chars)
+
+    def swap_chars(self, token, rng):
+        chars = self.token2char(token)
+        last = len(chars) - 1
+        for char_i in sorted(self._get_aug_char_idxes(chars, rng)):
+            # swap with an adjacent character, forced inwards at both ends of the token
+            if char_i == 0:
+                swap_position = 1
+            elif char_i == last:
+                swap_position = char_i - 1
+            else:
+                swap_position = char_i + (1 if rng.random() < 0.5 else -1)
+            is_original_upper, is_swap_upper = chars[char_i].isupper(), chars[swap_position].isupper()
+            chars[char_i], chars[swap_position] = chars[swap_position], chars[char_i]
+            chars[char_i] = chars[char_i].upper() if is_original_upper else chars[char_i].lower()
+            chars[swap_position] = chars[swap_position].upper() if is_swap_upper else chars[swap_position].lower()
+        return ''.join(chars)
+
+    def insert_chars(self, token, rng):
+        chars = self.token2char(token)
+        for char_i in sorted(self._get_aug_char_idxes(chars, rng), reverse=True):
+            chars.insert(char_i, self.choice(self.candidates, rng))
+        return ''.join(chars)
+
+    def substitute(self, analysis, rng):
         results = []
-        # Tokenize a text (e.g. The quick brown fox jumps over the lazy dog) to tokens (e.g. ['The', 'quick', ...])
-        tokens = self.tokenizer(data)
-        gaps = utils.find_all_gaps(data, tokens)
-
         # Get target tokens
-        aug_word_idxes = self._get_aug_idxes(tokens, self.aug_word_min, self.aug_word_max, self.aug_word_p, Method.WORD)
-        for token_i, token in enumerate(tokens):
+        aug_word_idxes = self._get_aug_word_idxes(analysis, rng)
+        for token_i, token in enumerate(analysis.tokens):
             # Do not augment if it is not the target
             if token_i not in aug_word_idxes:
                 results.append(token)
                 continue
-            token = self.telexDecomposer.generate_word_error(token)
-            action = np.random.choice(self.randomizers, p=self.pdf)
-            result = action.augment(token)
-            results.append(result)
+            token = self.telexDecomposer.generate_word_error(token, rng)
+            randomizer = self.randomizers[rng.choice(len(self.randomizers), p=self.pdf)]
+            results.append(randomizer(token, rng) if len(token) >= self.min_char else token)
 
-        return utils.reverse_tokenizer(results, gaps)
+        return self._output(analysis, results)
 
 
-class SubstituteHandler(nac.CharAugmenter, ABC):
+class SubstituteHandler(CharSpellingAugmenter, ABC):
     def __init__(self, name='SubstituteAugmenter', min_char=2, aug_char_p=0.3,
                  aug_word_min=1, aug_word_max=100, aug_word_p=0.3, tokenizer=None, reverse_tokenizer=None,
                  stopwords=None, verbose=0, stopwords_regex=None):
@@ -67,7 +91,7 @@ class SubstituteHandler(nac.CharAugmenter, ABC):
             name=name, action="substitute", min_char=min_char, aug_char_min=1,
             aug_char_max=10, aug_char_p=aug_char_p, aug_word_min=aug_word_min,
             aug_word_max=aug_word_max, aug_word_p=aug_word_p, tokenizer=tokenizer,
-            reverse_tokenizer=reverse_tokenizer, stopwords=stopwords, device='cpu',
+            reverse_tokenizer=reverse_tokenizer, stopwords=stopwords,
             verbose=verbose, stopwords_regex=stopwords_regex)
         self.eligibleCharacters = COMPOSITION_CHARS
         self.vowels = ['a', 'â', 'ă', 'e', 'ê', 'o', 'ô', 'ơ', 'u', 'ư', 'y']
@@ -78,13 +102,11 @@ class SubstituteHandler(nac.CharAugmenter, ABC):
     def check_if_vowel(char):
         return char.lower() in ['a', 'â', 'ă', 'e', 'ê', 'o', 'ô', 'ơ', 'u', 'ư', 'y']
 
-    def substitute(self, data):
+    def substitute(self, analysis, rng):
         results = []
-        tokens = self.tokenizer(data)
-        aug_word_idxes = self._get_aug_idxes(tokens, self.aug_word_min,
-                                             self.aug_word_max, self.aug_word_p, Method.WORD)
+        aug_word_idxes = self._get_aug_word_idxes(analysis, rng)
 
-        for token_i, token in enumerate(tokens):
+        for token_i, token in enumerate(analysis.tokens):
             if token_i not in aug_word_idxes:
                 results.append(token)
                 continue
@@ -93,16 +115,16 @@ class SubstituteHandler(nac.CharAugmenter, ABC):
             chars = self.token2char(token)
             i = 0
             while i < len(chars):
-                if random.random() < self.aug_char_p:
+                if rng.random() < self.aug_char_p:
                     if self.check_if_vowel(chars[i]):
-                        sub_char = self.sample(self.vowels, 1)[0]
+                        sub_char = self.choice(self.vowels, rng)
                         if chars[i].isupper():
                             result += sub_char.upper()
                         else:
                             result += sub_char
                     else:
                         if ''.join(chars[i:i + 2]).lower() in self.consonants_2:
-                            sub_char = self.sample(self.consonants_2, 1)[0]
+                            sub_char = self.choice(self.consonants_2, rng)
                             if chars[i].isupper():
                                 result += sub_char[0].upper()
                             else:
@@ -113,7 +135,7 @@ class SubstituteHandler(nac.CharAugmenter, ABC):
                                 result += sub_char[1]
                             i += 1
                         elif chars[i].lower() in self.consonants_1:
-                            sub_char = self.sample(self.consonants_1, 1)[0]
+                            sub_char = self.choice(self.consonants_1, rng)
                             if chars[i].isupper():
                                 result += sub_char.upper()
                             else:
@@ -130,10 +152,10 @@ class SubstituteHandler(nac.CharAugmenter, ABC):
 
             results.append(result)
 
-        return self.reverse_tokenizer(results)
+        return self._output(analysis, results, keep_spacing=False)
 
 
-class MisspellVowelHandler(nac.CharAugmenter, ABC):
+class MisspellVowelHandler(CharSpellingAugmenter, ABC):
     def __init__(self, name='MisspellVowelAugment', min_char=2, aug_char_p=0.3,
                  aug_word_min=1, aug_word_max=100, aug_word_p=0.3, tokenizer=None, reverse_tokenizer=None,
                  stopwords=None, verbose=0, stopwords_regex=None):
@@ -141,7 +163,7 @@ class MisspellVowelHandler(nac.CharAugmenter, ABC):
             name=name, action="substitute", min_char=min_char, aug_char_min=1,
             aug_char_max=10, aug_char_p=aug_char_p, aug_word_min=aug_word_min,
             aug_word_max=aug_word_max, aug_word_p=aug_word_p, tokenizer=tokenizer,
-            reverse_tokenizer=reverse_tokenizer, stopwords=stopwords, device='cpu',
+            reverse_tokenizer=reverse_tokenizer, stopwords=stopwords,
             verbose=verbose, stopwords_regex=stopwords_regex)
 
         self.model = {
@@ -153,6 +175,8 @@ class MisspellVowelHandler(nac.CharAugmenter, ABC):
             "anh": ["oanh"]
         }
         self.eligibleCharacters = self.model.keys()
+        self.vowel_patterns = {vowel: re.compile(re.escape(vowel)) for vowel in self.eligibleCharacters}
+        self.char_table = CharTable(self.model)
 
     def is_eligible(self, word):
         return any(map(lambda c: c in word, self.eligibleCharacters))
@@ -163,25 +187,25 @@ class MisspellVowelHandler(nac.CharAugmenter, ABC):
                 return vowel
         return None
 
-    def substitute(self, data):
+    def get_candidates(self, tokens):
+        return [token_i for token_i in self.pre_skip_aug(tokens) if self.is_eligible(tokens[token_i])]
+
+    def substitute(self, analysis, rng):
         results = []
-        tokens = self.tokenizer(data)
-        gaps = utils.find_all_gaps(data, tokens)
-        temp = [tok if self.is_eligible(tok) else '' for tok in tokens]
-        aug_word_idxes = self._get_aug_idxes(temp, self.aug_word_min, self.aug_word_max, self.aug_word_p, Method.WORD)
+        aug_word_idxes = self._get_aug_word_idxes(analysis, rng)
 
-        for token_i, token in enumerate(tokens):
+        for token_i, token in enumerate(analysis.tokens):
             if token_i not in aug_word_idxes:
                 results += [token]
                 continue
             vowel = self._get_vowel(token)
-            token = re.sub(vowel, self.sample(self.model[vowel], 1)[0], token)
+            token = self.vowel_patterns[vowel].sub(self.char_table.choose(vowel, rng.random()), token)
             results += [token]
 
-        return utils.reverse_tokenizer(results, gaps)
+        return self._output(analysis, results)
 
 
-class DuplicateHandler(nac.CharAugmenter, ABC):
+class DuplicateHandler(CharSpellingAugmenter, ABC):
     def __init__(self, name='DuplicateAugmenter', min_char=1, aug_char_min=0, aug_char_max=100, aug_char_p=0.3,
                  aug_word_min=0, aug_word_max=100, aug_word_p=0.3, tokenizer=None, reverse_tokenizer=None,
                  stopwords=None, verbose=0, stopwords_regex=None):
@@ -189,52 +213,28 @@ class DuplicateHandler(nac.CharAugmenter, ABC):
             name=name, action="insert", min_char=min_char, aug_char_min=aug_char_min,
             aug_char_max=aug_char_max, aug_char_p=aug_char_p, aug_word_min=aug_word_min,
             aug_word_max=aug_word_max, aug_word_p=aug_word_p, tokenizer=tokenizer,
-            reverse_tokenizer=reverse_tokenizer, stopwords=stopwords, device='cpu',
+            reverse_tokenizer=reverse_tokenizer, stopwords=stopwords,
             verbose=verbose, stopwords_regex=stopwords_regex)
 
-    def insert(self, data):
-        if not data or not data.strip():
-            return data
-
-        change_seq = 0
-
-        doc = Doc(data, self.tokenizer(data))
-        gaps = utils.find_all_gaps(data, doc.get_original_tokens())
-
-        aug_word_idxes = self._get_aug_idxes(
-            doc.get_original_tokens(), self.aug_word_min, self.aug_word_max, self.aug_word_p, Method.WORD)
-
-        if aug_word_idxes is None:
-            return data
-
-        for token_i, token in enumerate(doc.get_original_tokens()):
-            if token_i not in aug_word_idxes:
-                continue
-
-            chars = self.token2char(token)
-            aug_char_idxes = self._get_aug_idxes(chars, self.aug_char_min, self.aug_char_max, self.aug_char_p,
-                                                 Method.CHAR)
-            if aug_char_idxes is None:
-                continue
-
-            aug_char_idxes.sort(reverse=True)
-            for char_i in aug_char_idxes:
-                chars.insert(char_i, chars[char_i])
+    def duplicate_chars(self, token, rng):
+        chars = self.token2char(token)
+        for char_i in sorted(self._get_aug_char_idxes(chars, rng), reverse=True):
+            chars.insert(char_i, chars[char_i])
+        # No capitalization alignment as this augmenter try to simulate random error
+        return ''.join(chars)
 
-            # No capitalization alignment as this augmenter try to simulate random error
+    def insert(self, analysis, rng):
+        if not utils.is_valid_text(analysis.data):
+            return analysis.data
 
-            new_token = ''.join(chars)
-            change_seq += 1
-            doc.add_change_log(token_i, new_token=new_token, action=Action.INSERT,
-                               change_seq=self.parent_change_seq + change_seq)
+        aug_word_idxes = self._get_aug_word_idxes(analysis, rng)
+        results = [self.duplicate_chars(token, rng) if token_i in aug_word_idxes else token
+                   for token_i, token in enumerate(analysis.tokens)]
 
-        if self.include_detail:
-            return utils.reverse_tokenizer(doc.get_augmented_tokens(), gaps), doc.get_change_logs()
-        else:
-            return utils.reverse_tokenizer(doc.get_augmented_tokens(), gaps)
+        return self._output(analysis, results)
 
 
-class WhitespaceHandler(nac.CharAugmenter, ABC):
+class WhitespaceHandler(CharSpellingAugmenter, ABC):
     def __init__(self, name='WhitespaceAugmenter', min_char=2, aug_char_p=0.3,
                  aug_word_min=1, aug_word_max=2, aug_word_p=0.3, tokenizer=None, reverse_tokenizer=None,
                  stopwords=None, verbose=0, stopwords_regex=None):
@@ -242,70 +242,38 @@ class WhitespaceHandler(nac.CharAugmenter, ABC):
             name=name, action="substitute", min_char=min_char, aug_char_min=1,
             aug_char_max=10, aug_char_p=aug_char_p, aug_word_min=aug_word_min,
             aug_word_max=aug_word_max, aug_word_p=aug_word_p, tokenizer=tokenizer,
-            reverse_tokenizer=reverse_tokenizer, stopwords=stopwords, device='cpu',
+            reverse_tokenizer=reverse_tokenizer, stopwords=stopwords,
             verbose=verbose, stopwords_regex=stopwords_regex)
 
         self.eligibleCharacters = COMPOSITION_CHARS
 
-    @staticmethod
-    def _reverse_tokenizer(tokens, results, text):
-        tmp = text
-        final_string = ""
-        j = 0
-        for token in tokens:
-            x = re.search(token, tmp)
-            if token in final_string and token not in string.punctuation:
-                tmp = tmp[x.span()[1] + 1:]
-                continue
-            if x and x.span()[0] == 0:
-                final_string += results[j]
-                j += 1
-                tmp = tmp[x.span()[1]:]
-                if tmp:
-                    while tmp[0] == " ":
-                        tmp = tmp[1:]
-                        final_string += " "
-
-        return final_string
-
-    def substitute(self, data):
-        results = []
-        concat_word = []
-        tokens = self.tokenizer(data)
-        whitespaces = re.findall(" ", ' '.join(tokens))
-        aug_word_idxes = self._get_aug_idxes(whitespaces, self.aug_word_min,
-                                             self.aug_word_max, self.aug_word_p, Method.CHAR)
-        for whitespace_i, _ in enumerate(whitespaces):
-            if whitespace_i not in aug_word_idxes:
-                if tokens[whitespace_i] not in concat_word:
-                    if whitespace_i != len(whitespaces) - 1:
-                        results += [tokens[whitespace_i]]
-                    else:
-                        results += [tokens[whitespace_i], tokens[whitespace_i + 1]]
-                    continue
-                else:
-                    if whitespace_i == len(whitespaces) - 1:
-                        results += [tokens[whitespace_i + 1]]
-                    continue
-            elif tokens[whitespace_i] in string.punctuation or tokens[whitespace_i + 1] in string.punctuation:
-                if tokens[whitespace_i] in concat_word:
-                    # results += [tokens[whitespace_i + 1]]
-                    continue
-                elif whitespace_i != len(whitespaces) - 1:
-                    results += [tokens[whitespace_i]]
-                else:
-                    results += [tokens[whitespace_i], tokens[whitespace_i + 1]]
-            elif random.random() < self.aug_char_p:
-                if tokens[whitespace_i] not in concat_word:
-                    results += [tokens[whitespace_i] + tokens[whitespace_i + 1]]
-                    concat_word += [tokens[whitespace_i], tokens[whitespace_i + 1]]
-                else:
-                    results[-1] = results[-1] + tokens[whitespace_i + 1]
-                    concat_word += [tokens[whitespace_i + 1]]
-            else:
-                if whitespace_i != len(whitespaces) - 1:
-                    results += [tokens[whitespace_i]]
-                else:
-                    results += [tokens[whitespace_i], tokens[whitespace_i + 1]]
-
-        return self.reverse_tokenizer(results)
+    def analyze(self, data):
+        # the candidates are the spans of the whitespaces between two words, the text is not tokenized
+        eligible = [match.span() for match in MERGEABLE_WHITESPACE_REGEX.finditer(data)]
+        return Analysis(data, None, None, eligible, len(WHITESPACE_REGEX.findall(data)))
+
+    def substitute(self, analysis, rng):
+        data = analysis.data
+        # each picked whitespace is dropped with probability aug_char_p
+        removed = [span for span in sorted(self._get_aug_word_idxes(analysis, rng)) if rng.random() < self.aug_char_p]
+
+        pieces = []
+        position = 0
+        for start, end in removed:
+            pieces.append(data[position:start])
+            position = end
+        pieces.append(data[position:])
+        text = ''.join(pieces)
+
+        if not self.include_detail:
+            return text
+        # the position of a change is the index, among the tokens of ``tokenizer``, of the word before the
+        # dropped whitespace, as for the other augmenters
+        token_starts = [start for start, _ in utils.token_spans(data, self.tokenizer(data))]
+        changes = []
+        for start, end in removed:
+            left, right = data.rfind(' ', 0, start) + 1, data.find(' ', end)
+            right = len(data) if right < 0 else right
+            changes.append(dict(orig_token_pos=bisect.bisect_left(token_starts, start) - 1, orig_token=data[left:right],
+                                new_token=data[left:start] + data[end:right], action=self.action))
+        return text, changes
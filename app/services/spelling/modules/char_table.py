@@ -0,0 +1,48 @@
+import numpy as np
+
+
+class CharTable:
+    """
+    Precompiled substitution table: every eligible key, in lower and upper case, maps to a tuple of
+    candidates in the matching case. A text is transformed with one dict lookup per character,
+    one batch of pre-drawn random numbers and a single join.
+    """
+
+    def __init__(self, model, eligible=None):
+        self.model = model
+        self.candidates = {}
+        for key in (model.keys() if eligible is None else eligible):
+            if key not in model:
+                continue
+            replacements = tuple(model[key])
+            self.candidates[key] = replacements
+            if key.upper() != key:
+                self.candidates.setdefault(key.upper(), tuple(c.upper() for c in replacements))
+
+    def __contains__(self, key):
+        return key in self.candidates
+
+    def is_eligible(self, text):
+        return any(char in self.candidates for char in text)
+
+    def choose(self, key, draw):
+        """
+        The candidate of ``key`` selected by a uniform draw in [0, 1).
+        """
+        options = self.candidates[key]
+        return options[int(draw * len(options))]
+
+    def apply(self, text, p, rng=np.random):
+        """
+        Replace every eligible character of ``text`` with probability ``p`` by one of its candidates.
+        """
+        positions = [i for i, char in enumerate(text) if char in self.candidates]
+        if not positions:
+            return text
+
+        accept, pick = rng.random((2, len(positions)))
+        chars = list(text)
+        for i, accept_draw, pick_draw in zip(positions, accept, pick):
+            if accept_draw < p:
+                chars[i] = self.choose(chars[i], pick_draw)
+        return "".join(chars)
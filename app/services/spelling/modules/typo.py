@@ -1,13 +1,27 @@
 from abc import ABC
 
-import nlpaug.augmenter.char as nac
-from nlpaug.util import Action, Method, Doc
-
 import app.services.spelling.utils as utils
+from app.services.spelling.modules.augmenter import CharSpellingAugmenter
 from app.services.spelling.modules.base_module import TypoAugmenter
 
+# one-key QWERTY neighbours of every lower case letter
+QWERTY_NEIGHBOURS = {
+    'q': ['a', 's', 'w'], 'w': ['a', 'd', 'e', 'q', 's'], 'e': ['d', 'f', 'r', 's', 'w'],
+    'r': ['d', 'e', 'f', 'g', 't'], 't': ['f', 'g', 'h', 'r', 'y'], 'y': ['g', 'h', 'j', 't', 'u'],
+    'u': ['h', 'i', 'j', 'k'], 'i': ['j', 'k', 'l', 'o', 'u'], 'o': ['i', 'k', 'l', 'p'],
+    'p': ['l', 'o'], 'a': ['q', 's', 'w', 'x', 'z'], 's': ['a', 'c', 'd', 'e', 'q', 'w', 'x', 'z'],
+    'd': ['c', 'e', 'f', 'r', 's', 'v', 'w', 'x'], 'f': ['b', 'c', 'd', 'e', 'g', 'r', 't', 'v'],
+    'g': ['b', 'f', 'h', 'n', 'r', 't', 'v', 'y'], 'h': ['b', 'g', 'j', 'm', 'n', 't', 'u', 'y'],
+    'j': ['h', 'i', 'k', 'm', 'n', 'u', 'y'], 'k': ['i', 'j', 'l', 'm', 'o', 'u'], 'l': ['i', 'k', 'o', 'p'],
+    'z': ['a', 's', 'x'], 'x': ['a', 'c', 'd', 's', 'z'], 'c': ['d', 'f', 's', 'v', 'x'],
+    'v': ['b', 'c', 'd', 'f', 'g'], 'b': ['f', 'g', 'h', 'n', 'v'], 'n': ['b', 'g', 'h', 'j', 'm'],
+    'm': ['h', 'j', 'k', 'n']
+}
+
 
 class TelexHandler(TypoAugmenter, ABC):
+    typo_table_name = "telex"
+
     def __init__(self, name='TelexAugmenter', min_char=2, aug_char_min=1, aug_char_max=10, aug_char_p=0.3,
                  aug_word_min=1, aug_word_max=10, aug_word_p=0.3, tokenizer=None, reverse_tokenizer=None,
                  stopwords=None, verbose=0, stopwords_regex=None):
@@ -76,6 +90,8 @@ class TelexHandler(TypoAugmenter, ABC):
 
 
 class VNIHandler(TypoAugmenter, ABC):
+    typo_table_name = "vni"
+
     def __init__(self, name='VNIAugmenter', min_char=2, aug_char_min=1, aug_char_max=10, aug_char_p=0.3,
                  aug_word_min=1, aug_word_max=10, aug_word_p=0.3, tokenizer=None, reverse_tokenizer=None,
                  stopwords=None, verbose=0, stopwords_regex=None):
@@ -143,58 +159,37 @@ class VNIHandler(TypoAugmenter, ABC):
         return base_word, comp_word
 
 
-class KeyboardHandler(nac.KeyboardAug, ABC):
+class KeyboardHandler(CharSpellingAugmenter, ABC):
+    # https://arxiv.org/pdf/1711.02173.pdf
     def __init__(self, name='KeyboardHandler', aug_char_min=1, aug_char_max=10, aug_char_p=0.3,
                  aug_word_p=0.3, aug_word_min=1, aug_word_max=10, stopwords=None,
-                 tokenizer=None, reverse_tokenizer=None, include_special_char=False, include_numeric=False,
-                 include_upper_case=False, lang="en", verbose=0, stopwords_regex=None, model_path=None,
-                 min_char=1):
-        super().__init__(name=name, aug_char_min=aug_char_min, aug_char_max=aug_char_max, aug_char_p=aug_char_p,
-                         aug_word_p=aug_word_p, aug_word_min=aug_word_min, aug_word_max=aug_word_max,
-                         stopwords=stopwords,
-                         tokenizer=tokenizer, reverse_tokenizer=reverse_tokenizer,
-                         include_special_char=include_special_char,
-                         include_numeric=include_numeric, include_upper_case=include_upper_case, lang=lang,
-                         verbose=verbose,
-                         stopwords_regex=stopwords_regex, model_path=model_path, min_char=min_char)
+                 tokenizer=None, reverse_tokenizer=None, include_special_char=False, verbose=0, stopwords_regex=None,
+                 model=None, min_char=1):
+        super().__init__(name=name, action="substitute", min_char=min_char, aug_char_min=aug_char_min,
+                         aug_char_max=aug_char_max, aug_char_p=aug_char_p, aug_word_min=aug_word_min,
+                         aug_word_max=aug_word_max, aug_word_p=aug_word_p, tokenizer=tokenizer,
+                         reverse_tokenizer=reverse_tokenizer, stopwords=stopwords, verbose=verbose,
+                         stopwords_regex=stopwords_regex, include_special_char=include_special_char)
+        self.model = model or QWERTY_NEIGHBOURS
         self.telexDecomposer = TelexHandler()
 
-    def substitute(self, data):
-        if not data or not data.strip():
-            return data
+    def skip_aug(self, token_idxes, tokens):
+        return [token_idx for token_idx in token_idxes if tokens[token_idx] in self.model]
 
-        change_seq = 0
+    def substitute(self, analysis, rng):
+        if not utils.is_valid_text(analysis.data):
+            return analysis.data
 
-        doc = Doc(data, self.tokenizer(data))
-        gaps = utils.find_all_gaps(data, doc.get_original_tokens())
+        tokens = analysis.tokens
+        results = list(tokens)
 
-        aug_word_idxes = self._get_aug_idxes(doc.get_original_tokens(), self.aug_word_min,
-                                             self.aug_word_max, self.aug_word_p, Method.WORD)
-        for token_i, token in enumerate(doc.get_original_tokens()):
-            if token_i not in aug_word_idxes:
-                continue
-
-            new_token = ""
-            token = self.telexDecomposer.generate_word_error(token)
-            chars = self.token2char(token)
-            aug_char_idxes = self._get_aug_idxes(chars, self.aug_char_min, self.aug_char_max,
-                                                 self.aug_char_p, Method.CHAR)
-            if aug_char_idxes is None:
-                continue
-
-            for char_i, char in enumerate(chars):
-                if char_i not in aug_char_idxes:
-                    new_token += char
-                    continue
-
-                new_token += self.sample(self.model.predict(chars[char_i]), 1)[0]
+        aug_word_idxes = self._get_aug_word_idxes(analysis, rng)
+        for token_i in aug_word_idxes:
+            chars = self.token2char(self.telexDecomposer.generate_word_error(tokens[token_i], rng))
+            for char_i in self._get_aug_char_idxes(chars, rng):
+                chars[char_i] = self.choice(self.model[chars[char_i]], rng)
 
             # No capitalization alignment as this augmenter try to simulate typo
-            change_seq += 1
-            doc.add_change_log(token_i, new_token=new_token, action=Action.SUBSTITUTE,
-                               change_seq=self.parent_change_seq + change_seq)
-
-        if self.include_detail:
-            return utils.reverse_tokenizer(doc.get_augmented_tokens(), gaps), doc.get_change_logs()
-        else:
-            return utils.reverse_tokenizer(doc.get_augmented_tokens(), gaps)
+            results[token_i] = ''.join(chars)
+
+        return self._output(analysis, results)
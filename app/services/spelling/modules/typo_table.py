@@ -0,0 +1,125 @@
+import argparse
+import bisect
+import os
+from functools import lru_cache
+
+import numpy as np
+from tqdm import tqdm
+
+from app.services.shared_tables import StringArray, load_mapped
+
+WORDS_FILE = "words.npy"
+VARIANTS_TABLE = "variants"
+OFFSETS_FILE = "offsets.npy"
+CDF_FILE = "cdf.npy"
+ROW_CACHE_SIZE = 4096
+
+
+class TypoVariantTable:
+    """
+    Every Telex/VNI error string of a vocabulary word with its cumulative probability, compiled offline
+    from ``TypoAugmenter.enumerate_word_errors``. A word is augmented with a single uniform draw.
+
+    The words are a sorted, memory-mapped unicode array searched with ``np.searchsorted``, so no index
+    is built in memory; the rows of the most recently used words are kept decoded.
+    """
+
+    def __init__(self, words, offsets, variants, cdf):
+        self.words = words
+        self.offsets = offsets
+        self.variants = variants
+        self.cdf = cdf
+        self._row = lru_cache(maxsize=ROW_CACHE_SIZE)(self._decode_row)
+
+    def __contains__(self, word):
+        return self._find(word) is not None
+
+    def __len__(self):
+        return len(self.words)
+
+    def _find(self, word):
+        i = int(np.searchsorted(self.words, word))
+        if i < len(self.words) and self.words[i] == word:
+            return i
+        return None
+
+    def _decode_row(self, word):
+        i = self._find(word)
+        if i is None:
+            return None
+        start, end = int(self.offsets[i]), int(self.offsets[i + 1])
+        return self.variants[start:end], self.cdf[start:end].tolist()
+
+    def sample(self, word, draw):
+        """
+        The error string of ``word`` selected by a uniform draw in [0, 1), None for out-of-vocabulary words.
+        """
+        row = self._row(word)
+        if row is None:
+            return None
+        variants, cdf = row
+        return variants[min(bisect.bisect_right(cdf, draw), len(variants) - 1)]
+
+    @classmethod
+    def compile(cls, augmenter, vocab):
+        words, variants, cdf = [], [], []
+        offsets = [0]
+        for word in tqdm(sorted(set(vocab))):
+            errors = augmenter.enumerate_word_errors(word)
+            if list(errors) == [word]:
+                continue
+            probs = np.cumsum(list(errors.values()))
+            words.append(word)
+            variants.extend(errors)
+            cdf.extend(probs / probs[-1])
+            offsets.append(len(variants))
+
+        return cls(np.array(words, dtype=str), np.array(offsets, dtype=np.int64),
+                   StringArray.from_strings(variants), np.array(cdf, dtype=np.float32))
+
+    def save(self, path, name):
+        path = os.path.join(path, name)
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, WORDS_FILE), self.words)
+        self.variants.save(path, VARIANTS_TABLE)
+        np.save(os.path.join(path, OFFSETS_FILE), self.offsets)
+        np.save(os.path.join(path, CDF_FILE), self.cdf)
+
+    @classmethod
+    def load(cls, path, name):
+        path = os.path.join(path, name)
+        return cls(load_mapped(os.path.join(path, WORDS_FILE)),
+                   load_mapped(os.path.join(path, OFFSETS_FILE)),
+                   StringArray.load(path, VARIANTS_TABLE),
+                   load_mapped(os.path.join(path, CDF_FILE)))
+
+
+@lru_cache(maxsize=None)
+def load_typo_table(path, name):
+    if not os.path.exists(os.path.join(path, name, WORDS_FILE)):
+        return None
+    return TypoVariantTable.load(path, name)
+
+
+def read_syllables(file_paths):
+    syllables = set()
+    for file_path in file_paths:
+        with open(file_path, encoding="utf-8") as f:
+            syllables.update(f.read().split())
+    # capitalized forms are compiled too, as they are common at the start of a sentence
+    return syllables | {syllable.capitalize() for syllable in syllables}
+
+
+if __name__ == "__main__":
+    from app.core.config import EDIT_DISTANCE_PATH, TYPO_TABLE_PATH
+    from app.services.spelling.modules.typo import TelexHandler, VNIHandler
+
+    parser = argparse.ArgumentParser(description="Compile the Telex/VNI typo variant tables of a syllable vocabulary")
+    parser.add_argument("--vocab", nargs="+", default=[EDIT_DISTANCE_PATH],
+                        help="text files whose whitespace-separated tokens are the vocabulary")
+    parser.add_argument("--output", default=TYPO_TABLE_PATH)
+    args = parser.parse_args()
+
+    vocab = read_syllables(args.vocab)
+    for handler in (TelexHandler(), VNIHandler()):
+        TypoVariantTable.compile(handler, vocab).save(args.output, handler.typo_table_name)
@@ -1,89 +1,110 @@
 from abc import ABC
 
-import random as normal_random
-import nlpaug.augmenter.word as naw
-from nlpaug.util import Action, Doc
-
 import app.services.spelling.utils as utils
+from app.services.spelling.modules.augmenter import WordSpellingAugmenter
 
 
-class DuplicateWordHandler(naw.SpellingAug, ABC):
-    def __init__(self, dict_path=None, name='DuplicateWordAugmenter', aug_min=1, aug_max=10, aug_p=0.3, stopwords=None,
-                 tokenizer=None, reverse_tokenizer=None, include_reverse=True, stopwords_regex=None,
-                 verbose=0):
-        super().__init__(dict_path=dict_path, name=name, aug_min=aug_min, aug_max=aug_max, aug_p=aug_p,
+class DuplicateWordHandler(WordSpellingAugmenter, ABC):
+    def __init__(self, name='DuplicateWordAugmenter', aug_min=1, aug_max=10, aug_p=0.3, stopwords=None,
+                 tokenizer=None, reverse_tokenizer=None, stopwords_regex=None, verbose=0):
+        super().__init__(name=name, action="substitute", aug_min=aug_min, aug_max=aug_max, aug_p=aug_p,
                          stopwords=stopwords,
-                         tokenizer=tokenizer, reverse_tokenizer=reverse_tokenizer, include_reverse=include_reverse,
+                         tokenizer=tokenizer, reverse_tokenizer=reverse_tokenizer,
                          stopwords_regex=stopwords_regex,
                          verbose=verbose)
 
-    def substitute(self, data):
-        if not utils.is_valid_text(data):
-            return data
-
-        tokens = self.tokenizer(data)
-        gaps = utils.find_all_gaps(data, tokens)
+    def substitute(self, analysis, rng):
+        if not utils.is_valid_text(analysis.data):
+            return analysis.data
 
-        aug_idxes = self._get_random_aug_idxes(tokens)
-        if aug_idxes is None or len(aug_idxes) == 0:
-            return data
-        aug_idxes.sort(reverse=True)
-        for idx in aug_idxes:
-            tokens.insert(idx, tokens[idx])
-            gaps.insert(idx + 1, ' ')
-        return utils.reverse_tokenizer(tokens, gaps)
+        tokens = analysis.tokens
+        results = tokens.copy()
+        for idx in self._get_aug_idxes(analysis, rng):
+            results[idx] = tokens[idx] + ' ' + tokens[idx]
+        return self._output(analysis, results)
 
 
-class InsertIrrelevantWordHandler(naw.SpellingAug, ABC):
-    def __init__(self, dict_path=None, name='InsertIrrelevantWordAugmenter', aug_min=1, aug_max=2, aug_p=0.3,
+class InsertIrrelevantWordHandler(WordSpellingAugmenter, ABC):
+    def __init__(self, name='InsertIrrelevantWordAugmenter', aug_min=1, aug_max=2, aug_p=0.3,
                  stopwords=None,
-                 tokenizer=None, reverse_tokenizer=None, include_reverse=True, stopwords_regex=None,
-                 verbose=0, file_path='edit3.txt'):
-        super().__init__(dict_path=dict_path, name=name, aug_min=aug_min, aug_max=aug_max, aug_p=aug_p,
+                 tokenizer=None, reverse_tokenizer=None, stopwords_regex=None,
+                 verbose=0, file_path='edit3.txt', vocab=None):
+        super().__init__(name=name, action="substitute", aug_min=aug_min, aug_max=aug_max, aug_p=aug_p,
                          stopwords=stopwords,
-                         tokenizer=tokenizer, reverse_tokenizer=reverse_tokenizer, include_reverse=include_reverse,
+                         tokenizer=tokenizer, reverse_tokenizer=reverse_tokenizer,
                          stopwords_regex=stopwords_regex,
                          verbose=verbose)
 
-        self.vocab = None
-        self.create_vocab(file_path)
+        self.vocab = vocab
+        if self.vocab is None:
+            self.create_vocab(file_path)
 
-    def create_vocab(self, file_path):
+    @staticmethod
+    def read_vocab(file_path):
         with open(file_path, encoding='utf-8') as f:
             contents = f.read().replace('\n', ' ')
-            self.vocab = list(set(contents.split(' ')))
+            # file order, so seeded draws do not depend on the hash seed of the process
+            return list(dict.fromkeys(contents.split(' ')))
 
-    def substitute(self, data):
-        if not utils.is_valid_text(data):
-            return data
+    def create_vocab(self, file_path):
+        self.vocab = self.read_vocab(file_path)
 
-        tokens = self.tokenizer(data)
-        gaps = utils.find_all_gaps(data, tokens)
+    def substitute(self, analysis, rng):
+        if not utils.is_valid_text(analysis.data):
+            return analysis.data
 
-        aug_idxes = self._get_random_aug_idxes(tokens)
-        if aug_idxes is None or len(aug_idxes) == 0:
-            return data
-        aug_idxes.sort(reverse=True)
-        for idx in aug_idxes:
-            sample = normal_random.choices(self.vocab, k=1)[0]
+        tokens = analysis.tokens
+        results = tokens.copy()
+        for idx in sorted(self._get_aug_idxes(analysis, rng), reverse=True):
+            sample = self.choice(self.vocab, rng)
             while sample == tokens[idx]:
-                sample = normal_random.choices(self.vocab, k=1)[0]
-            tokens.insert(idx, sample)
-            gaps.insert(idx + 1, ' ')
-        return utils.reverse_tokenizer(tokens, gaps)
+                sample = self.choice(self.vocab, rng)
+            results[idx] = sample + ' ' + tokens[idx]
+        return self._output(analysis, results)
 
 
-class EditDistanceHandler(naw.SpellingAug, ABC):
+class SplitWordHandler(WordSpellingAugmenter, ABC):
+    # https://arxiv.org/pdf/1812.05271v1.pdf
+    def __init__(self, name='SplitWordAugmenter', aug_min=1, aug_max=10, aug_p=0.3, min_char=4, stopwords=None,
+                 tokenizer=None, reverse_tokenizer=None, stopwords_regex=None, verbose=0):
+        super().__init__(name=name, action="split", aug_min=aug_min, aug_max=aug_max, aug_p=aug_p,
+                         stopwords=stopwords,
+                         tokenizer=tokenizer, reverse_tokenizer=reverse_tokenizer,
+                         stopwords_regex=stopwords_regex,
+                         verbose=verbose)
+        self.min_char = min_char
+
+    def skip_aug(self, token_idxes, tokens):
+        return [token_idx for token_idx in token_idxes if len(tokens[token_idx]) >= self.min_char]
+
+    def split(self, analysis, rng):
+        if not utils.is_valid_text(analysis.data):
+            return analysis.data
+
+        tokens = analysis.tokens
+        results = list(tokens)
+        for idx in self._get_aug_idxes(analysis, rng):
+            token = tokens[idx]
+            separate_pos = 1 + int(rng.random() * (len(token) - 1))
+            results[idx] = token[:separate_pos] + ' ' + token[separate_pos:]
+        return self._output(analysis, results)
+
+
+class EditDistanceHandler(WordSpellingAugmenter, ABC):
     def __init__(self, dict_path=None, name='MyEditDistanceAugmenter', aug_min=1, aug_max=10, aug_p=0.3, stopwords=None,
-                 tokenizer=None, reverse_tokenizer=None, include_reverse=True, stopwords_regex=None,
-                 verbose=0):
-        super().__init__(dict_path=dict_path, name=name, aug_min=aug_min, aug_max=aug_max, aug_p=aug_p,
+                 tokenizer=None, reverse_tokenizer=None, stopwords_regex=None,
+                 verbose=0, model_dict=None):
+        super().__init__(name=name, action="substitute", aug_min=aug_min, aug_max=aug_max, aug_p=aug_p,
                          stopwords=stopwords,
-                         tokenizer=tokenizer, reverse_tokenizer=reverse_tokenizer, include_reverse=include_reverse,
+                         tokenizer=tokenizer, reverse_tokenizer=reverse_tokenizer,
                          stopwords_regex=stopwords_regex,
                          verbose=verbose)
-        if dict_path:
-            self.model.dict = self.read(dict_path)
+        if model_dict is not None:
+            self.model = model_dict
+        elif dict_path:
+            self.model = self.read(dict_path)
+        else:
+            self.model = {}
 
     @staticmethod
     def read(model_path):
@@ -101,33 +122,25 @@ class EditDistanceHandler(naw.SpellingAug, ABC):
                     ans[key] = []
 
                 ans[key].extend(values)
-                # Remove duplicate mapping
-                ans[key] = list(set(ans[key]))
+                # Remove duplicate mapping, keeping the file order
+                ans[key] = list(dict.fromkeys(ans[key]))
             return ans
 
-    def substitute(self, data):
-        if not data or not data.strip():
-            return data
-
-        change_seq = 0
-        doc = Doc(data, self.tokenizer(data))
-        gaps = utils.find_all_gaps(data, doc.get_original_tokens())
+    def skip_aug(self, token_idxes, tokens):
+        return [token_idx for token_idx in token_idxes if self.model.get(tokens[token_idx])]
 
-        aug_idxes = self._get_aug_idxes(doc.get_original_tokens())
+    def substitute(self, analysis, rng):
+        if not utils.is_valid_text(analysis.data):
+            return analysis.data
 
-        if aug_idxes is None or len(aug_idxes) == 0:
-            if self.include_detail:
-                return data, []
-            return data
+        tokens = analysis.tokens
+        results = list(tokens)
 
-        for aug_idx, original_token in enumerate(doc.get_original_tokens()):
-            # Skip if no augment for word
-            if aug_idx not in aug_idxes:
-                continue
-
-            candidate_words = self.model.predict(original_token)
+        for aug_idx in self._get_aug_idxes(analysis, rng):
+            original_token = tokens[aug_idx]
+            candidate_words = self.model.get(original_token)
             if candidate_words:
-                substitute_token = self.sample(candidate_words, 1)[0]
+                substitute_token = self.choice(candidate_words, rng)
             else:
                 # Unexpected scenario. Adding original token
                 substitute_token = original_token
@@ -135,11 +148,6 @@ class EditDistanceHandler(naw.SpellingAug, ABC):
             if aug_idx == 0:
                 substitute_token = self.align_capitalization(original_token, substitute_token)
 
-            change_seq += 1
-            doc.add_change_log(aug_idx, new_token=substitute_token, action=Action.SUBSTITUTE,
-                               change_seq=self.parent_change_seq + change_seq)
+            results[aug_idx] = substitute_token
 
-        if self.include_detail:
-            return utils.reverse_tokenizer(doc.get_augmented_tokens(), gaps), doc.get_change_logs()
-        else:
-            return utils.reverse_tokenizer(doc.get_augmented_tokens(), gaps)
+        return self._output(analysis, results)
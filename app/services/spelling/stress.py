@@ -0,0 +1,92 @@
+import argparse
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.services.benchmark_data import load_sentences
+from app.services.spelling_handler import (
+    TypoHandler,
+    AccentHandler,
+    SpellingReplacementHandler,
+    WordHandler,
+    CharHandler
+)
+
+ACTIONS = {
+    TypoHandler: ["telex", "vni", "keyboard"],
+    AccentHandler: ["missing_dialect", "no_dialect", "wrong_dialect"],
+    SpellingReplacementHandler: ["begin", "final"],
+    WordHandler: ["duplicate", "insert", "edit_distance", "split", "swap", "delete"],
+    CharHandler: ["random", "substitute", "misspell_vowel", "duplicate", "whitespace"],
+}
+
+CONFIGS = [
+    dict(p_aug=1, min_aug=1, max_aug=2, exclude=[], aug_char_p=0.6),
+    dict(p_aug=0.3, min_aug=1, max_aug=10, exclude=["trời"], aug_char_p=0.1),
+    dict(p_aug=0.5, min_aug=0, max_aug=5, exclude=["nay", "hồ"], aug_char_p=1),
+]
+
+
+def load_jobs(sentences, seeds):
+    jobs = []
+    for handler_cls, actions in ACTIONS.items():
+        handler = handler_cls()
+        handler.get_model()
+        jobs.extend((handler, action, sentence, config, seed)
+                    for action in actions for sentence in sentences for config in CONFIGS for seed in seeds)
+    return jobs
+
+
+def run_job(job):
+    handler, action, sentence, config, seed = job
+    # the result cache is bypassed, every job is augmented again
+    return handler._augment_batch(action, [sentence], is_segmented=False, segment=False, num_variants=2, seed=seed,
+                                  **config)[0]
+
+
+def snapshot(jobs):
+    handlers = {id(job[0]): job[0] for job in jobs}.values()
+    return [(type(handler).__name__, name, dict(vars(aug)))
+            for handler in handlers for name, aug in vars(type(handler)).items() if hasattr(aug, "augment")]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run seeded spelling augmentations with different configs from a "
+                                                 "thread pool and check they match a sequential run")
+    parser.add_argument("--data", default=None, help="Text file with one sentence per line")
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--seeds", type=int, default=3)
+    args = parser.parse_args()
+
+    jobs = load_jobs(load_sentences(args.data), range(args.seeds))
+    expected = [run_job(job) for job in jobs]
+    # taken after the sequential run, which also builds the tables compiled on first use
+    before = snapshot(jobs)
+
+    mismatches = 0
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        for _ in range(args.rounds):
+            order = random.sample(range(len(jobs)), len(jobs))
+            for i, result in zip(order, pool.map(run_job, [jobs[i] for i in order])):
+                if result != expected[i]:
+                    mismatches += 1
+                    handler, action, sentence, config, seed = jobs[i]
+                    print(f"mismatch {type(handler).__name__}.{action} seed={seed} {config}: "
+                          f"{result} != {expected[i]}")
+    elapsed = time.perf_counter() - start
+
+    changed = [(handler, name) for (handler, name, state), (_, _, after) in zip(before, snapshot(jobs))
+               if state != after]
+    for handler, name in changed:
+        print(f"shared augmenter {handler}.{name} was modified")
+
+    print(f"{args.rounds * len(jobs)} jobs on {args.threads} threads in {elapsed:.2f}s: "
+          f"{mismatches} mismatches, {len(changed)} modified augmenters")
+    if mismatches or changed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,30 +1,22 @@
+from app.services.utils import join_spans, token_spans
+
+
 def reverse_tokenizer(tokens, gaps):
     assert 0 <= len(gaps) - len(tokens) <= 1
     if len(gaps) > len(tokens):
-        tokens.append('')
-    ans = ''
-    for t, g in zip(tokens, gaps):
-        ans = ans + g + t
-    return ans
+        tokens = tokens + ['']
+    return ''.join(g + t for t, g in zip(tokens, gaps))
 
 
 def find_all_gaps(text, tokens):
-    assert text.startswith(tokens[0])
+    spans = token_spans(text, tokens)
     gaps = []
-    gap = ''
-    while text or tokens:
-        if not tokens:
-            gap = text
-            gaps.append(gap)
-            break
-        if text.startswith(tokens[0]):
-            text = text[len(tokens[0]):]
-            tokens = tokens[1:]
-            gaps.append(gap)
-            gap = ''
-        else:
-            gap += text[0]
-            text = text[1:]
+    position = 0
+    for start, end in spans:
+        gaps.append(text[position:start])
+        position = end
+    if position < len(text):
+        gaps.append(text[position:])
     return gaps
 
 
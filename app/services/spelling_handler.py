@@ -1,55 +1,82 @@
+from abc import ABC
+
 from app.services.base_augmenter import Augmenter
+from app.services.spelling.modules.augmenter import AugmentConfig
 from app.services.spelling.modules.base_module import default_tokenizer
 from app.services.spelling.modules.typo import *
 from app.services.spelling.modules.accent import *
 from app.services.spelling.modules.spelling_replacement import *
 from app.services.spelling.modules.word import *
 from app.services.spelling.modules.char import *
-from app.services.utils import tokenize, revert_segmented_tokens, mask_exclude_tokens, reconstruct
+from app.services.utils import (
+    mask_exclude_tokens,
+    reconstruct,
+    revert_segmented_tokens,
+    text_rng,
+    tokenize
+)
 from app.services.word_segment.word_segment import TextProcessor
 from app.services.eda_handler import EdaHandler
-from app.core.config import IRRELEVANT_WORD_PATH, EDIT_DISTANCE_PATH
+from app.services.shared_tables import SharedTables
+from app.core.config import IRRELEVANT_WORD_PATH, EDIT_DISTANCE_PATH, SHARED_TABLES_PATH
 
 text_processor = TextProcessor()
 
 
-def change_config(aug_handler, p_aug, min_aug, max_aug, exclude=None, aug_char_p=None, aug_type="norm"):
-    if exclude:
-        aug_handler.stop_words = exclude
+def configure(aug_handler, config):
+    """
+    ``aug_handler`` set up with ``config``; the loaded singleton itself is never modified.
+    """
+    return aug_handler.configure(config)
 
-    if aug_type == "word":
-        aug_handler.aug_p = p_aug
-        aug_handler.aug_min = min_aug
-        aug_handler.aug_max = max_aug
-    else:
-        aug_handler.aug_word_p = p_aug
-        aug_handler.aug_word_min = min_aug
-        aug_handler.aug_word_max = max_aug
 
-        if aug_char_p:
-            aug_handler.aug_char_p = aug_char_p
+def augment_text(aug_handler, text, n=1, rng=None):
+    return aug_handler.augment(text, n=n, rng=rng)
 
 
 class BaseSpellingHandler(Augmenter, ABC):
-    def transform_spelling(self, action, text, p_aug, min_aug, max_aug, exclude, **kwargs):
+    def get_augmenter(self, action, p_aug, min_aug, max_aug, exclude, **kwargs):
+        """
+        Configure the augmenter of ``action`` once and return a function mapping one text, the number of
+        variants to draw and its random generator (None when unseeded) to its augmented texts.
+        """
         raise NotImplementedError
 
-    def augment(self, action, text, p_aug, min_aug, max_aug, exclude, is_segmented, segment, **kwargs):
-        self.validate_action(action)
+    @staticmethod
+    def get_config(p_aug, min_aug, max_aug, exclude, aug_char_p=None):
+        return AugmentConfig(p_aug=p_aug, min_aug=min_aug, max_aug=max_aug, exclude=frozenset(exclude or ()),
+                             aug_char_p=aug_char_p)
+
+    @staticmethod
+    def get_aug_char_p(kwargs):
+        # the routes send the character probability as ``p_char_aug``
+        return kwargs.get("aug_char_p", kwargs.get("p_char_aug"))
+
+    def transform_spelling(self, action, text, p_aug, min_aug, max_aug, exclude, **kwargs):
+        return self.get_augmenter(action, p_aug, min_aug, max_aug, exclude, **kwargs)(text, 1, None)
+
+    def _augment_batch(self, action, texts, p_aug, min_aug, max_aug, exclude, is_segmented, segment, num_variants,
+                       seed, **kwargs):
+        masked = [mask_exclude_tokens(text, exclude) for text in texts]
+        exclude_keys = sorted(set().union(*(exclude_map.keys() for _, exclude_map in masked)))
+        augmenter = self.get_augmenter(action, p_aug, min_aug, max_aug, exclude_keys, **kwargs)
 
-        text, exclude_map = mask_exclude_tokens(text, exclude)
+        results = []
+        for original_text, (text, exclude_map) in zip(texts, masked):
+            rng = text_rng(seed, original_text) if seed is not None else None
 
-        if is_segmented:
-            tokens = tokenize(text)
-            text = " ".join(revert_segmented_tokens(tokens))
+            if is_segmented:
+                tokens = tokenize(text)
+                text = " ".join(revert_segmented_tokens(tokens))
 
-        transform_text = self.transform_spelling(action, text, p_aug, min_aug, max_aug, (exclude_map.keys()), **kwargs)
+            # the text is analyzed once and every variant is drawn from that analysis
+            transform_text = self.collect_variants(augmenter(text, num_variants, rng))
 
-        if segment:
-            transform_text = [text_processor.process(t) for t in transform_text]
+            if segment:
+                transform_text = [text_processor.process(t) for t in transform_text]
 
-        transform_text = [reconstruct(t, exclude_map) for t in transform_text]
-        return transform_text
+            results.append([reconstruct(t, exclude_map) for t in transform_text])
+        return results
 
 
 class AccentHandler(BaseSpellingHandler, ABC):
@@ -72,18 +99,16 @@ class AccentHandler(BaseSpellingHandler, ABC):
         assert action in ["missing", "none", "wrong"], \
             "Please choose action in {missing, none, wrong}"
 
-    def transform_spelling(self, action, text, p_aug, min_aug, max_aug, exclude, **kwargs):
+    def get_augmenter(self, action, p_aug, min_aug, max_aug, exclude, **kwargs):
         if action == "missing_dialect":
-            change_config(self.missing_dialect_aug, p_aug, min_aug, max_aug, exclude=exclude)
-            transform_text = [self.missing_dialect_aug.augment(text)]
+            aug = self.missing_dialect_aug
         elif action == "no_dialect":
-            change_config(self.no_dialect_aug, p_aug, min_aug, max_aug, exclude=exclude)
-            transform_text = [self.no_dialect_aug.augment(text)]
+            aug = self.no_dialect_aug
         else:
-            change_config(self.wrong_dialect_aug, p_aug, min_aug, max_aug, exclude=exclude)
-            transform_text = [self.wrong_dialect_aug.augment(text)]
+            aug = self.wrong_dialect_aug
 
-        return transform_text
+        aug = configure(aug, self.get_config(p_aug, min_aug, max_aug, exclude))
+        return lambda text, n, rng: augment_text(aug, text, n, rng)
 
 
 class TypoHandler(BaseSpellingHandler, ABC):
@@ -101,17 +126,16 @@ class TypoHandler(BaseSpellingHandler, ABC):
     def _is_eligible_token(self, token):
         pass
 
-    def transform_spelling(self, action, text, p_aug, min_aug, max_aug, exclude, **kwargs):
+    def get_augmenter(self, action, p_aug, min_aug, max_aug, exclude, **kwargs):
         if action == "telex":
-            change_config(self.telex_aug, p_aug, min_aug, max_aug, exclude=exclude)
-            transform_text = [self.telex_aug.augment(text)]
+            aug = self.telex_aug
         elif action == "vni":
-            change_config(self.vni_aug, p_aug, min_aug, max_aug, exclude=exclude)
-            transform_text = [self.vni_aug.augment(text)]
+            aug = self.vni_aug
         else:
-            change_config(self.keyboard_aug, p_aug, min_aug, max_aug, exclude=exclude)
-            transform_text = [self.keyboard_aug.augment(text)]
-        return transform_text
+            aug = self.keyboard_aug
+
+        aug = configure(aug, self.get_config(p_aug, min_aug, max_aug, exclude))
+        return lambda text, n, rng: augment_text(aug, text, n, rng)
 
     @staticmethod
     def validate_action(action):
@@ -145,15 +169,11 @@ class SpellingReplacementHandler(BaseSpellingHandler, ABC):
         assert action in ["begin", "final"], \
             "Please choose action in {begin, final}"
 
-    def transform_spelling(self, action, text, p_aug, min_aug, max_aug, exclude, **kwargs):
-        if action == "begin":
-            change_config(self.begin_aug, p_aug, min_aug, max_aug, exclude=exclude, aug_char_p=kwargs["aug_char_p"])
-            transform_text = [self.begin_aug.augment(text)]
-        else:
-            change_config(self.final_aug, p_aug, min_aug, max_aug, exclude=exclude, aug_char_p=kwargs["aug_char_p"])
-            transform_text = [self.final_aug.augment(text)]
+    def get_augmenter(self, action, p_aug, min_aug, max_aug, exclude, **kwargs):
+        aug = self.begin_aug if action == "begin" else self.final_aug
 
-        return transform_text
+        aug = configure(aug, self.get_config(p_aug, min_aug, max_aug, exclude, self.get_aug_char_p(kwargs)))
+        return lambda text, n, rng: augment_text(aug, text, n, rng)
 
 
 class WordHandler(BaseSpellingHandler, ABC):
@@ -170,17 +190,21 @@ class WordHandler(BaseSpellingHandler, ABC):
                 not cls.edit_distance_aug or \
                 not cls.split_aug or not \
                 cls.eda_aug:
+            shared_tables = SharedTables.attach(SHARED_TABLES_PATH)
             cls.duplicate_aug = DuplicateWordHandler(aug_p=1, aug_min=1, aug_max=2)
             cls.insert_irrelevant_aug = InsertIrrelevantWordHandler(file_path=IRRELEVANT_WORD_PATH,
+                                                                    vocab=shared_tables.irrelevant_vocab
+                                                                    if shared_tables else None,
                                                                     aug_p=1,
                                                                     aug_min=1,
                                                                     aug_max=2)
-            cls.edit_distance_aug = EditDistanceHandler(dict_path=EDIT_DISTANCE_PATH,
-                                                        include_reverse=False,
+            cls.edit_distance_aug = EditDistanceHandler(dict_path=None if shared_tables else EDIT_DISTANCE_PATH,
+                                                        model_dict=shared_tables.edit_distance
+                                                        if shared_tables else None,
                                                         aug_p=1,
                                                         aug_min=1,
                                                         aug_max=2)
-            cls.split_aug = naw.SplitAug(aug_p=1, aug_min=1, aug_max=2)
+            cls.split_aug = SplitWordHandler(aug_p=1, aug_min=1, aug_max=2)
             cls.eda_aug = EdaHandler()
 
     def _is_eligible_token(self, token):
@@ -191,30 +215,29 @@ class WordHandler(BaseSpellingHandler, ABC):
         assert action in ["duplicate", "insert", "edit_distance", "split", "swap", "delete"], \
             "Please choose action in {duplicate, insert, edit_distance, swap, delete, split}"
 
-    def transform_spelling(self, action, text, p_aug, min_aug, max_aug, exclude, **kwargs):
+    def get_augmenter(self, action, p_aug, min_aug, max_aug, exclude, **kwargs):
         if action == "duplicate":
-            change_config(self.duplicate_aug, p_aug, min_aug, max_aug, exclude=exclude, aug_type="word")
-            transform_text = [self.duplicate_aug.augment(text)]
+            aug = self.duplicate_aug
         elif action == "insert":
-            change_config(self.insert_irrelevant_aug, p_aug, min_aug, max_aug, exclude=exclude, aug_type="word")
-            transform_text = [self.insert_irrelevant_aug.augment(text)]
+            aug = self.insert_irrelevant_aug
         elif action == "split":
-            change_config(self.split_aug, p_aug, min_aug, max_aug, exclude=exclude, aug_type="word")
-            transform_text = [self.split_aug.augment(text)]
+            aug = self.split_aug
         elif action == "edit_distance":
-            change_config(self.edit_distance_aug, p_aug, min_aug, max_aug, exclude=exclude, aug_type="word")
-            transform_text = [self.edit_distance_aug.augment(text)]
+            aug = self.edit_distance_aug
         else:
-            transform_text = self.eda_aug.augment(action,
-                                                  text,
-                                                  p_aug,
-                                                  min_aug,
-                                                  max_aug,
-                                                  exclude=exclude,
-                                                  is_segmented=False,
-                                                  segment=False)
+            return lambda text, n, rng: self.eda_aug.augment(action,
+                                                             text,
+                                                             p_aug,
+                                                             min_aug,
+                                                             max_aug,
+                                                             exclude=exclude,
+                                                             is_segmented=False,
+                                                             segment=False,
+                                                             num_variants=n,
+                                                             seed=None if rng is None else int(rng.integers(2 ** 32)))
 
-        return transform_text
+        aug = configure(aug, self.get_config(p_aug, min_aug, max_aug, exclude))
+        return lambda text, n, rng: augment_text(aug, text, n, rng)
 
 
 class CharHandler(BaseSpellingHandler, ABC):
@@ -249,22 +272,20 @@ class CharHandler(BaseSpellingHandler, ABC):
         assert action in ["duplicate", "random", "misspell_vowel", "substitute", "whitespace"], \
             "Please choose action in {duplicate, random, misspell_vowel, substitute, whitespace}"
 
-    def transform_spelling(self, action, text, p_aug, min_aug, max_aug, exclude, **kwargs):
+    def get_augmenter(self, action, p_aug, min_aug, max_aug, exclude, **kwargs):
+        aug_char_p = None
         if action == "random":
-            change_config(self.random_aug, p_aug, min_aug, max_aug)
-            transform_text = [self.random_aug.augment(text)]
+            aug = self.random_aug
         elif action == "substitute":
-            change_config(self.substitute_aug, p_aug, min_aug, max_aug, exclude=exclude, aug_char_p=kwargs["aug_char_p"])
-            transform_text = [self.substitute_aug.augment(text)]
+            aug = self.substitute_aug
+            aug_char_p = self.get_aug_char_p(kwargs)
         elif action == "misspell_vowel":
-            change_config(self.misspell_vowel_aug, p_aug, min_aug, max_aug, exclude=exclude)
-            transform_text = [self.misspell_vowel_aug.augment(text)]
+            aug = self.misspell_vowel_aug
         elif action == "duplicate":
             # TODO: check carefully here
-            change_config(self.duplicate_aug, p_aug, min_aug, max_aug, exclude=exclude)
-            transform_text = [self.duplicate_aug.augment(text)]
+            aug = self.duplicate_aug
         else:
-            change_config(self.whitespace_aug, p_aug, min_aug, max_aug, exclude=exclude)
-            transform_text = [self.whitespace_aug.augment(text)]
+            aug = self.whitespace_aug
 
-        return transform_text
+        aug = configure(aug, self.get_config(p_aug, min_aug, max_aug, exclude, aug_char_p))
+        return lambda text, n, rng: augment_text(aug, text, n, rng)
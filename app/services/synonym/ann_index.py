@@ -0,0 +1,200 @@
+import argparse
+import json
+import os
+
+import numpy as np
+from loguru import logger
+from tqdm import tqdm
+
+from app.services.synonym.utils import staged_dir, top_k
+from app.services.synonym.vectors import FastTextVectors
+
+CENTROIDS_FILE = "centroids.npy"
+OFFSETS_FILE = "offsets.npy"
+LIST_IDS_FILE = "list_ids.npy"
+RECALL_FILE = "recall.json"
+
+
+class IVFIndex(FastTextVectors):
+    """
+    Inverted-file approximate nearest-neighbour index over a fastText vector store.
+
+    Vectors are clustered with spherical k-means into ``nlist`` lists; a query only scores
+    the vectors of its ``nprobe`` closest lists. Raising ``nprobe`` trades latency for recall.
+
+    ``build`` picks the smallest ``nprobe`` whose recall@k against the exact search reaches ``min_recall``
+    on a sample of the vocabulary; that recall is saved with the index and checked when it is loaded,
+    together with the shape and vocabulary checksum of the store the index was built on.
+    """
+
+    def __init__(self, words, matrix, centroids, offsets, list_ids, nprobe=16, scales=None, recall=None):
+        super().__init__(words, matrix, scales)
+        self.centroids = centroids
+        self.offsets = offsets
+        self.list_ids = list_ids
+        self.nprobe = nprobe
+        self.recall = recall
+
+    @staticmethod
+    def _assign(vectors, centroids, batch_size=8192):
+        assignment = np.empty(len(vectors), dtype=np.int64)
+        for start in range(0, len(vectors), batch_size):
+            batch = vectors.get_vectors(slice(start, start + batch_size))
+            assignment[start:start + batch_size] = np.argmax(batch @ centroids.T, axis=1)
+        return assignment
+
+    @classmethod
+    def train_centroids(cls, vectors, nlist, n_iter=10, sample_size=None, seed=0):
+        rng = np.random.default_rng(seed)
+        sample_size = min(len(vectors), sample_size or nlist * 64)
+        sample = FastTextVectors([], vectors.get_vectors(np.sort(rng.choice(len(vectors), sample_size, replace=False))))
+        centroids = sample.matrix[rng.choice(sample_size, nlist, replace=False)].copy()
+
+        for _ in tqdm(range(n_iter)):
+            assignment = cls._assign(sample, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample.matrix)
+            counts = np.bincount(assignment, minlength=nlist)
+
+            empty = counts == 0
+            sums[empty] = sample.matrix[rng.choice(sample_size, int(empty.sum()), replace=False)]
+            centroids = cls.normalize(sums)
+
+        return centroids
+
+    @classmethod
+    def build(cls, vectors, nlist=None, n_iter=10, sample_size=None, seed=0, min_recall=0.9, topk=10,
+              n_queries=500):
+        nlist = min(len(vectors), nlist or int(4 * np.sqrt(len(vectors))))
+        centroids = cls.train_centroids(vectors, nlist, n_iter=n_iter, sample_size=sample_size, seed=seed)
+
+        assignment = cls._assign(vectors, centroids)
+        list_ids = np.argsort(assignment, kind="stable").astype(np.int32)
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(assignment, minlength=nlist))]).astype(np.int64)
+
+        index = cls(vectors.words, vectors.matrix, centroids, offsets, list_ids, scales=vectors.scales)
+        index.tune_nprobe(min_recall=min_recall, topk=topk, n_queries=n_queries, seed=seed)
+        return index
+
+    def exact_search(self, rows, topk=20, batch_size=None):
+        """
+        Exact ``topk`` neighbours of the given rows, scored against the whole store in small batches.
+        """
+        rows = np.asarray(rows)
+        batch_size = batch_size or max(1, 2 ** 24 // len(self))
+        ids, scores = zip(*(FastTextVectors.search(self, rows[start:start + batch_size], topk=topk)
+                            for start in range(0, len(rows), batch_size)))
+        return np.concatenate(ids), np.concatenate(scores)
+
+    def _query_recalls(self, rows, exact_ids, nprobe=None):
+        ids, _ = self.search(rows, topk=exact_ids.shape[1], nprobe=nprobe)
+        return np.array([len(np.intersect1d(found, exact)) / len(exact) for found, exact in zip(ids, exact_ids)])
+
+    def measure_recall(self, rows, exact_ids, nprobe=None):
+        """
+        Mean fraction of the exact neighbours ``exact_ids`` of ``rows`` that are returned with ``nprobe``.
+        """
+        return float(np.mean(self._query_recalls(rows, exact_ids, nprobe=nprobe)))
+
+    def tune_nprobe(self, min_recall=0.9, topk=10, n_queries=500, seed=0):
+        """
+        Set ``nprobe`` to the smallest power of two (or ``nlist``) whose recall on sampled rows reaches
+        ``min_recall`` by two standard errors, so that it also holds for rows outside the sample.
+        """
+        rows = np.random.default_rng(seed).choice(len(self), min(n_queries, len(self)), replace=False)
+        exact_ids, _ = self.exact_search(rows, topk=topk)
+
+        nprobe = 1
+        while True:
+            recalls = self._query_recalls(rows, exact_ids, nprobe=nprobe)
+            recall = float(np.mean(recalls))
+            if recall - 2 * np.std(recalls) / np.sqrt(len(recalls)) >= min_recall or nprobe >= len(self.centroids):
+                break
+            nprobe = min(2 * nprobe, len(self.centroids))
+
+        self.nprobe, self.recall = nprobe, recall
+        return nprobe, recall
+
+    @staticmethod
+    def store_signature(vectors):
+        return {"n_vectors": len(vectors), "dim": int(vectors.matrix.shape[1]), "vocab": vectors.words.checksum}
+
+    def save_index(self, path):
+        with staged_dir(path) as staging:
+            np.save(os.path.join(staging, CENTROIDS_FILE), self.centroids)
+            np.save(os.path.join(staging, OFFSETS_FILE), self.offsets)
+            np.save(os.path.join(staging, LIST_IDS_FILE), self.list_ids)
+            with open(os.path.join(staging, RECALL_FILE), "w", encoding="utf-8") as f:
+                json.dump({"nprobe": self.nprobe, "recall": self.recall, **self.store_signature(self)}, f)
+
+    @classmethod
+    def load_index(cls, path, vectors, nprobe=0, min_recall=0.9):
+        """
+        The index saved in ``path`` over ``vectors``, or None when its measured recall is missing or below
+        ``min_recall``, or when it was built on another store. ``nprobe`` can only raise the tuned value.
+        """
+        recall_path = os.path.join(path, RECALL_FILE)
+        if not os.path.exists(recall_path):
+            logger.warning(f"IVF index in {path} has no measured recall")
+            return None
+        with open(recall_path, encoding="utf-8") as f:
+            measured = json.load(f)
+        if measured["recall"] < min_recall:
+            logger.warning(f"IVF index in {path} has a recall of {measured['recall']:.3f} < {min_recall}")
+            return None
+        signature = cls.store_signature(vectors)
+        mismatches = [key for key, value in signature.items() if measured.get(key) != value]
+        if mismatches:
+            logger.warning(f"IVF index in {path} was built on another vector store ({', '.join(mismatches)} differ)")
+            return None
+
+        centroids = np.load(os.path.join(path, CENTROIDS_FILE))
+        offsets = np.load(os.path.join(path, OFFSETS_FILE))
+        list_ids = np.load(os.path.join(path, LIST_IDS_FILE), mmap_mode="r")
+        return cls(vectors.words, vectors.matrix, centroids, offsets, list_ids, nprobe=max(nprobe, measured["nprobe"]),
+                   scales=vectors.scales, recall=measured["recall"])
+
+    def search(self, rows, topk=20, nprobe=None):
+        rows = np.asarray(rows)
+        return self.search_vectors(self.get_vectors(rows), topk=topk, nprobe=nprobe, exclude=rows)
+
+    def search_vectors(self, queries, topk=20, nprobe=None, exclude=None):
+        """
+        Approximate ``topk`` neighbours of each query. Missing slots are padded with id -1.
+        """
+        nprobe = min(nprobe or self.nprobe, len(self.centroids))
+        probes = top_k(queries @ self.centroids.T, nprobe)
+
+        ids = np.full((len(queries), topk), -1, dtype=np.int64)
+        scores = np.full((len(queries), topk), -np.inf, dtype=np.float32)
+        for i, (query, lists) in enumerate(zip(queries, probes)):
+            candidates = np.sort(np.concatenate([self.list_ids[self.offsets[l]:self.offsets[l + 1]] for l in lists]))
+            if exclude is not None:
+                candidates = candidates[candidates != exclude[i]]
+
+            candidate_scores = self.get_vectors(candidates) @ query
+            top = top_k(candidate_scores, topk)
+            ids[i, :len(top)] = candidates[top]
+            scores[i, :len(top)] = candidate_scores[top]
+
+        return ids, scores
+
+
+if __name__ == "__main__":
+    from app.core.config import ANN_INDEX_PATH, ANN_MIN_RECALL, FASTTEXT_BINARY_PATH
+
+    parser = argparse.ArgumentParser(description="Build the IVF approximate nearest-neighbour index")
+    parser.add_argument("--vectors", default=FASTTEXT_BINARY_PATH, help="fastText binary store directory")
+    parser.add_argument("--output", default=ANN_INDEX_PATH)
+    parser.add_argument("--nlist", type=int, default=None, help="Number of clusters, defaults to 4 * sqrt(V)")
+    parser.add_argument("--n-iter", type=int, default=10)
+    parser.add_argument("--sample-size", type=int, default=None)
+    parser.add_argument("--min-recall", type=float, default=ANN_MIN_RECALL,
+                        help="recall@10 against the exact search that nprobe is tuned to reach")
+    args = parser.parse_args()
+
+    fasttext_vectors = FastTextVectors.load(args.vectors)
+    index = IVFIndex.build(fasttext_vectors, nlist=args.nlist, n_iter=args.n_iter, sample_size=args.sample_size,
+                           min_recall=args.min_recall)
+    print(f"nprobe {index.nprobe} of {len(index.centroids)} lists, recall@10 {index.recall:.3f}")
+    index.save_index(args.output)
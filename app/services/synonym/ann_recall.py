@@ -0,0 +1,51 @@
+import argparse
+
+import numpy as np
+
+from app.services.synonym.ann_index import IVFIndex
+from app.services.synonym.vectors import FastTextVectors
+
+
+def clustered_vectors(n_words, dim, n_clusters, spread=0.5, seed=0):
+    """
+    Normalized vectors scattered around random centres, closer to word embeddings than uniform noise.
+    """
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((n_clusters, dim)).astype(np.float32)
+    matrix = centres[rng.integers(n_clusters, size=n_words)]
+    matrix += spread * rng.standard_normal((n_words, dim)).astype(np.float32)
+    return FastTextVectors([f"w{i}" for i in range(n_words)], FastTextVectors.normalize(matrix).astype(np.float32))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the IVF index and check its recall@k against the exact "
+                                                 "search on held-out query rows")
+    parser.add_argument("--vectors", default=None, help="fastText binary store directory, clustered random "
+                                                        "vectors are used when it is not given")
+    parser.add_argument("--words", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=64)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--topk", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--min-recall", type=float, default=0.9)
+    args = parser.parse_args()
+
+    if args.vectors:
+        vectors = FastTextVectors.load(args.vectors)
+    else:
+        vectors = clustered_vectors(args.words, args.dim, args.clusters)
+
+    # nprobe is tuned on one sample of rows and checked on another
+    index = IVFIndex.build(vectors, min_recall=args.min_recall, topk=args.topk, n_queries=args.queries, seed=0)
+    rows = np.random.default_rng(1).choice(len(index), min(args.queries, len(index)), replace=False)
+    exact_ids, _ = index.exact_search(rows, topk=args.topk)
+    recall = index.measure_recall(rows, exact_ids)
+
+    print(f"{len(index)} vectors, nprobe {index.nprobe} of {len(index.centroids)} lists: "
+          f"recall@{args.topk} {index.recall:.3f} when tuned, {recall:.3f} on held-out rows")
+    if recall < args.min_recall:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
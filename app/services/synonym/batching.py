@@ -0,0 +1,59 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import torch
+
+
+class MicroBatcher:
+    """
+    Gathers masked-LM inputs from concurrent callers and runs them as one padded forward pass.
+
+    A batch is closed when it reaches ``max_batch_size`` inputs or ``max_wait_ms`` after its first
+    input arrived, whichever comes first. Each caller blocks until its own rows are ready.
+    """
+
+    def __init__(self, forward, max_batch_size=32, max_wait_ms=5):
+        self.forward = forward
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.queue = queue.Queue()
+        self.worker = threading.Thread(target=self._run, name="phobert-micro-batcher", daemon=True)
+        self.worker.start()
+
+    def submit(self, encoded):
+        future = Future()
+        self.queue.put((encoded, future))
+        return future
+
+    def mask_logits(self, encoded):
+        futures = [self.submit(item) for item in encoded]
+        return torch.stack([future.result() for future in futures])
+
+    def _next_batch(self):
+        batch = [self.queue.get()]
+        deadline = time.monotonic() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            try:
+                logits = self.forward([encoded for encoded, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            for row, (_, future) in zip(logits, batch):
+                future.set_result(row)
@@ -0,0 +1,80 @@
+import argparse
+import string
+import time
+
+import numpy as np
+import torch
+
+from app.services.benchmark_data import load_sentences
+from app.services.synonym.masked_lm import MaskedLM
+from app.services.synonym_handler import SynonymHandler
+from app.services.utils import tokenize
+
+
+def masked_positions(sentences):
+    positions = []
+    for sentence in sentences:
+        tokens = tokenize(sentence)
+        for idx, token in enumerate(tokens):
+            if token not in string.punctuation:
+                positions.append((idx, tokens))
+    return positions
+
+
+def run(masked_lm, windows, topk):
+    latencies = []
+    predictions = []
+    for window in windows:
+        start = time.perf_counter()
+        filled = masked_lm.fill_mask(window, topk=topk)
+        latencies.append((time.perf_counter() - start) * 1000)
+        predictions.append([_[2].lower() for _ in filled])
+    return np.array(latencies), predictions
+
+
+def chosen_synonyms(candidates, predictions, num_keep):
+    return [[synonym for synonym in words if synonym in predicted][:num_keep]
+            for words, predicted in zip(candidates, predictions)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare fp32 and dynamic int8 PhoBERT on CPU")
+    parser.add_argument("--data", default=None, help="Text file with one sentence per line")
+    parser.add_argument("--topk", type=int, default=50)
+    parser.add_argument("--num-similar", type=int, default=5)
+    parser.add_argument("--num-keep", type=int, default=1)
+    parser.add_argument("--num-threads", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.num_threads > 0:
+        torch.set_num_threads(args.num_threads)
+
+    positions = masked_positions(load_sentences(args.data))
+    windows = [SynonymHandler._mask_window(idx, tokens) for idx, tokens in positions]
+
+    handler = SynonymHandler()
+    handler.fasttext_data = SynonymHandler.load_fasttext()
+    candidates = handler._find_similar_words([tokens[idx] for idx, tokens in positions], num_similar=args.num_similar)
+
+    results = {}
+    for mode in ["fp32", "int8"]:
+        masked_lm = MaskedLM(SynonymHandler.load_phobert(mode), cache_size=0)
+        run(masked_lm, windows[:1], args.topk)
+        results[mode] = run(masked_lm, windows, args.topk)
+
+    for mode, (latencies, _) in results.items():
+        print(f"{mode}: mean {latencies.mean():.2f}ms, p50 {np.percentile(latencies, 50):.2f}ms, "
+              f"p99 {np.percentile(latencies, 99):.2f}ms over {len(latencies)} masked windows")
+
+    fp32_predictions, int8_predictions = results["fp32"][1], results["int8"][1]
+    top1 = np.mean([a[0] == b[0] for a, b in zip(fp32_predictions, int8_predictions)])
+    overlap = np.mean([len(set(a) & set(b)) / len(a) for a, b in zip(fp32_predictions, int8_predictions)])
+    fp32_synonyms = chosen_synonyms(candidates, fp32_predictions, args.num_keep)
+    int8_synonyms = chosen_synonyms(candidates, int8_predictions, args.num_keep)
+    synonyms = np.mean([a == b for a, b in zip(fp32_synonyms, int8_synonyms)])
+
+    print(f"top-1 agreement {top1:.3f}, top-{args.topk} overlap {overlap:.3f}, synonym agreement {synonyms:.3f}")
+
+
+if __name__ == "__main__":
+    main()
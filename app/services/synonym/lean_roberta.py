@@ -0,0 +1,224 @@
+import argparse
+import os
+import shutil
+
+import torch
+import torch.nn.functional as F
+from torch import nn
+
+CHECKPOINT_FILE = "model.pt"
+BPE_CODES_FILE = "bpe.codes"
+
+
+class LeanDictionary:
+    """
+    Subset of fairseq's ``Dictionary`` needed for masked-LM inference.
+    """
+
+    def __init__(self, symbols):
+        self.symbols = symbols
+        self.indices = {symbol: i for i, symbol in enumerate(symbols)}
+        self.unk_index = self.indices["<unk>"]
+        self.pad_index = self.indices["<pad>"]
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def pad(self):
+        return self.pad_index
+
+    def unk(self):
+        return self.unk_index
+
+    def index(self, symbol):
+        return self.indices.get(symbol, self.unk_index)
+
+    def encode_line(self, line, append_eos=False, add_if_not_exist=False):
+        ids = [self.index(word) for word in line.split()]
+        if append_eos:
+            ids.append(self.indices["</s>"])
+        return torch.IntTensor(ids)
+
+    def string(self, indices):
+        return " ".join(self.symbols[int(i)] for i in indices)
+
+
+class LeanBPE:
+    """
+    fastBPE codes applied through the standalone ``fastBPE`` extension, as fairseq's wrapper does.
+    """
+
+    def __init__(self, codes_path):
+        import fastBPE
+
+        self.bpe = fastBPE.fastBPE(codes_path)
+        self.bpe_symbol = "@@ "
+
+    def encode(self, x):
+        return self.bpe.apply([x])[0]
+
+    def decode(self, x):
+        return (x + " ").replace(self.bpe_symbol, "").rstrip()
+
+
+class SelfAttention(nn.Module):
+    def __init__(self, embed_dim, num_heads):
+        super().__init__()
+        self.num_heads = num_heads
+        self.head_dim = embed_dim // num_heads
+        self.scaling = self.head_dim ** -0.5
+        self.q_proj = nn.Linear(embed_dim, embed_dim)
+        self.k_proj = nn.Linear(embed_dim, embed_dim)
+        self.v_proj = nn.Linear(embed_dim, embed_dim)
+        self.out_proj = nn.Linear(embed_dim, embed_dim)
+
+    def _split_heads(self, x):
+        batch_size, length, _ = x.shape
+        return x.view(batch_size, length, self.num_heads, self.head_dim).transpose(1, 2)
+
+    def forward(self, x, padding_mask):
+        q = self._split_heads(self.q_proj(x)) * self.scaling
+        k = self._split_heads(self.k_proj(x))
+        v = self._split_heads(self.v_proj(x))
+
+        attn = (q @ k.transpose(-1, -2)).masked_fill(padding_mask[:, None, None, :], float("-inf"))
+        out = attn.softmax(dim=-1) @ v
+        return self.out_proj(out.transpose(1, 2).reshape(x.shape))
+
+
+class EncoderLayer(nn.Module):
+    def __init__(self, embed_dim, num_heads, ffn_dim):
+        super().__init__()
+        self.self_attn = SelfAttention(embed_dim, num_heads)
+        self.self_attn_layer_norm = nn.LayerNorm(embed_dim)
+        self.fc1 = nn.Linear(embed_dim, ffn_dim)
+        self.fc2 = nn.Linear(ffn_dim, embed_dim)
+        self.final_layer_norm = nn.LayerNorm(embed_dim)
+
+    def forward(self, x, padding_mask):
+        x = self.self_attn_layer_norm(x + self.self_attn(x, padding_mask))
+        return self.final_layer_norm(x + self.fc2(F.gelu(self.fc1(x))))
+
+
+class LMHead(nn.Module):
+    def __init__(self, embed_dim, vocab_size):
+        super().__init__()
+        self.dense = nn.Linear(embed_dim, embed_dim)
+        self.layer_norm = nn.LayerNorm(embed_dim)
+        self.weight = nn.Parameter(torch.zeros(vocab_size, embed_dim))
+        self.bias = nn.Parameter(torch.zeros(vocab_size))
+
+    def forward(self, features):
+        return F.linear(self.layer_norm(F.gelu(self.dense(features))), self.weight) + self.bias
+
+
+class RobertaMaskedLM(nn.Module):
+    """
+    Inference-only RoBERTa masked LM (post-LN encoder + LM head) matching fairseq's parameter layout.
+    """
+
+    def __init__(self, vocab_size, padding_idx=1, layers=12, embed_dim=768, num_heads=12, ffn_dim=3072,
+                 max_positions=256):
+        super().__init__()
+        self.padding_idx = padding_idx
+        self.embed_tokens = nn.Embedding(vocab_size, embed_dim, padding_idx=padding_idx)
+        self.embed_positions = nn.Embedding(max_positions + padding_idx + 1, embed_dim, padding_idx=padding_idx)
+        self.layernorm_embedding = nn.LayerNorm(embed_dim)
+        self.layers = nn.ModuleList([EncoderLayer(embed_dim, num_heads, ffn_dim) for _ in range(layers)])
+        self.lm_head = LMHead(embed_dim, vocab_size)
+
+    def forward(self, tokens, features_only=False, return_all_hiddens=False):
+        padding_mask = tokens.eq(self.padding_idx)
+        positions = torch.cumsum(~padding_mask, dim=1) * ~padding_mask + self.padding_idx
+
+        x = self.layernorm_embedding(self.embed_tokens(tokens) + self.embed_positions(positions))
+        x = x * (~padding_mask).unsqueeze(-1).type_as(x)
+        for layer in self.layers:
+            x = layer(x, padding_mask)
+
+        if features_only:
+            return x, {}
+        return self.lm_head(x), {}
+
+
+class LeanTask:
+    def __init__(self, dictionary):
+        self.source_dictionary = dictionary
+        self.mask_idx = dictionary.index("<mask>")
+
+
+class LeanRobertaHub(nn.Module):
+    """
+    Exposes the parts of fairseq's ``RobertaHubInterface`` used by ``MaskedLM``
+    (``model``, ``task``, ``bpe``, ``device``) without importing fairseq.
+    """
+
+    def __init__(self, model, dictionary, bpe):
+        super().__init__()
+        self.model = model
+        self.task = LeanTask(dictionary)
+        self.bpe = bpe
+
+    @property
+    def device(self):
+        return next(self.model.parameters()).device
+
+    def fill_mask(self, masked_input, topk=5):
+        from app.services.synonym.masked_lm import MaskedLM
+
+        return MaskedLM(self, cache_size=0).fill_mask(masked_input, topk=topk)
+
+
+def export(hub, bpe_codes, output):
+    """
+    Save a fairseq RoBERTa hub as a lean artifact: encoder and LM head weights, architecture, dictionary, BPE codes.
+    """
+    state_dict = {}
+    for key, value in hub.model.state_dict().items():
+        if key.startswith("encoder.sentence_encoder."):
+            name = key[len("encoder.sentence_encoder."):]
+        elif key.startswith("encoder.lm_head."):
+            name = "lm_head." + key[len("encoder.lm_head."):]
+        else:
+            continue
+        if not name.endswith("_float_tensor") and not name.startswith("version"):
+            state_dict[name] = value
+
+    n_layers = 1 + max(int(key.split(".")[1]) for key in state_dict if key.startswith("layers."))
+    dictionary = hub.task.source_dictionary
+    args = {
+        "vocab_size": len(dictionary),
+        "padding_idx": dictionary.pad(),
+        "layers": n_layers,
+        "embed_dim": state_dict["embed_tokens.weight"].shape[1],
+        "num_heads": hub.model.encoder.sentence_encoder.layers[0].self_attn.num_heads,
+        "ffn_dim": state_dict["layers.0.fc1.weight"].shape[0],
+        "max_positions": state_dict["embed_positions.weight"].shape[0] - dictionary.pad() - 1,
+    }
+
+    os.makedirs(output, exist_ok=True)
+    torch.save({"args": args, "model": state_dict, "symbols": list(dictionary.symbols)},
+               os.path.join(output, CHECKPOINT_FILE))
+    shutil.copy(bpe_codes, os.path.join(output, BPE_CODES_FILE))
+
+
+def load(path):
+    checkpoint = torch.load(os.path.join(path, CHECKPOINT_FILE), map_location="cpu")
+    model = RobertaMaskedLM(**checkpoint["args"])
+    model.load_state_dict(checkpoint["model"])
+    model.eval()
+    return LeanRobertaHub(model, LeanDictionary(checkpoint["symbols"]), LeanBPE(os.path.join(path, BPE_CODES_FILE)))
+
+
+if __name__ == "__main__":
+    from fairseq.models.roberta import RobertaModel
+
+    from app.core.config import PHOBERT_LEAN_PATH, PHOBERT_PATH
+
+    parser = argparse.ArgumentParser(description="Export PhoBERT into a lean inference-only artifact")
+    parser.add_argument("--phobert", default=PHOBERT_PATH)
+    parser.add_argument("--output", default=PHOBERT_LEAN_PATH)
+    args = parser.parse_args()
+
+    phobert = RobertaModel.from_pretrained(args.phobert, checkpoint_file=CHECKPOINT_FILE)
+    export(phobert, os.path.join(args.phobert, BPE_CODES_FILE), args.output)
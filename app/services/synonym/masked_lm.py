@@ -0,0 +1,152 @@
+from typing import List
+
+import torch
+
+from app.services.cache import LRUCache
+from app.services.synonym.batching import MicroBatcher
+
+MASK_TOKEN = "<mask>"
+
+
+def quantize_dynamic(model):
+    """
+    Dynamic int8 quantization of every Linear layer, for CPU inference.
+    """
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+class MaskedLM:
+    """
+    Batched masked-LM inference on top of a fairseq RoBERTa hub interface (PhoBERT).
+
+    ``fill_mask_batch`` gives the same predictions as calling ``hub.fill_mask`` once per input,
+    but pads every input into one batch and runs a single forward pass per ``batch_size`` inputs.
+    After ``enable_micro_batching`` the inputs of concurrent callers are batched together as well.
+    Results are cached by masked input, so a repeated context window costs no forward pass.
+    """
+
+    def __init__(self, hub, batch_size=16, cache_size=10000):
+        self.hub = hub
+        self.batch_size = batch_size
+        self.dictionary = hub.task.source_dictionary
+        self.batcher = None
+        self.cache = LRUCache(maxsize=cache_size)
+
+    def enable_micro_batching(self, max_batch_size=32, max_wait_ms=5):
+        self.batcher = MicroBatcher(self.forward, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+
+    def encode(self, masked_input):
+        assert masked_input.count(MASK_TOKEN) == 1, f"Please add exactly one {MASK_TOKEN} token to the input"
+
+        text_spans = masked_input.split(MASK_TOKEN)
+        text_spans_bpe = (" {0} ".format(MASK_TOKEN)).join(
+            [self.hub.bpe.encode(text_span.rstrip()) for text_span in text_spans]
+        ).strip()
+        return self.dictionary.encode_line("<s> " + text_spans_bpe + " </s>",
+                                           append_eos=False,
+                                           add_if_not_exist=False).long()
+
+    def collate(self, encoded: List[torch.Tensor]):
+        tokens = torch.full((len(encoded), max(len(t) for t in encoded)), self.dictionary.pad(), dtype=torch.long)
+        for i, t in enumerate(encoded):
+            tokens[i, :len(t)] = t
+        return tokens
+
+    def forward(self, encoded: List[torch.Tensor]):
+        """
+        Run one padded forward pass and return the logits at the mask position of each input.
+        """
+        tokens = self.collate(encoded).to(device=self.hub.device)
+        with torch.no_grad():
+            features, _ = self.hub.model(tokens, features_only=False, return_all_hiddens=False)
+        mask_positions = (tokens == self.hub.task.mask_idx).nonzero(as_tuple=False)
+        return features[mask_positions[:, 0], mask_positions[:, 1], :]
+
+    def mask_logits(self, encoded: List[torch.Tensor]):
+        """
+        Return the output logits at the mask position of each encoded input, shape (len(encoded), vocab).
+        """
+        if self.batcher is not None:
+            return self.batcher.mask_logits(encoded)
+
+        logits = []
+        for start in range(0, len(encoded), self.batch_size):
+            logits.append(self.forward(encoded[start:start + self.batch_size]))
+        return torch.cat(logits, dim=0)
+
+    def decode(self, index):
+        predicted_token_bpe = self.dictionary.string([index])
+        predicted_token = self.hub.bpe.decode(predicted_token_bpe)
+        if predicted_token_bpe.startswith("▁"):
+            predicted_token = " " + predicted_token
+        return predicted_token
+
+    def fill_mask_batch(self, masked_inputs: List[str], topk=5):
+        """
+        Return, for each masked input, the ``topk`` (filled_text, probability, predicted_token) triples.
+        """
+        keys = [("fill_mask", masked_input, topk) for masked_input in masked_inputs]
+        return self.cache.get_many(keys, lambda missing: self._fill_mask_batch([key[1] for key in missing], topk))
+
+    def _fill_mask_batch(self, masked_inputs: List[str], topk=5):
+        if not masked_inputs:
+            return []
+
+        logits = self.mask_logits([self.encode(masked_input) for masked_input in masked_inputs])
+        values, indices = logits.softmax(dim=-1).topk(k=topk, dim=-1)
+
+        results = []
+        for masked_input, row_values, row_indices in zip(masked_inputs, values.tolist(), indices.tolist()):
+            filled = []
+            for value, index in zip(row_values, row_indices):
+                predicted_token = self.decode(index)
+                if " {0}".format(MASK_TOKEN) in masked_input:
+                    filled.append((masked_input.replace(" {0}".format(MASK_TOKEN), predicted_token), value,
+                                   predicted_token))
+                else:
+                    filled.append((masked_input.replace(MASK_TOKEN, predicted_token), value, predicted_token))
+            results.append(filled)
+        return results
+
+    def candidate_index(self, word):
+        """
+        Dictionary index of ``word`` if it is a single PhoBERT token, else None.
+        """
+        bpe_tokens = self.hub.bpe.encode(word).split()
+        if len(bpe_tokens) != 1:
+            return None
+        index = self.dictionary.index(bpe_tokens[0])
+        return None if index == self.dictionary.unk() else index
+
+    def score_candidates(self, masked_inputs: List[str], candidates: List[List[str]]):
+        """
+        Return, for each masked input, its candidates with their probability at the mask position,
+        sorted by descending probability. Only the candidate logits are read: there is no top-k
+        sort and no decoding. Candidates that are not a single PhoBERT token are dropped.
+        """
+        keys = [("candidates", masked_input, tuple(words)) for masked_input, words in zip(masked_inputs, candidates)]
+        return self.cache.get_many(keys, lambda missing: self._score_candidates([key[1] for key in missing],
+                                                                                [key[2] for key in missing]))
+
+    def _score_candidates(self, masked_inputs: List[str], candidates: List[List[str]]):
+        if not masked_inputs:
+            return []
+
+        logits = self.mask_logits([self.encode(masked_input) for masked_input in masked_inputs])
+        log_normalizer = torch.logsumexp(logits, dim=-1)
+
+        results = []
+        for row_logits, row_log_normalizer, words in zip(logits, log_normalizer, candidates):
+            known = [(word, self.candidate_index(word)) for word in words]
+            known = [(word, index) for word, index in known if index is not None]
+            if not known:
+                results.append([])
+                continue
+
+            indices = torch.tensor([index for _, index in known], device=row_logits.device)
+            probs = (row_logits[indices] - row_log_normalizer).exp().tolist()
+            results.append(sorted(zip([word for word, _ in known], probs), key=lambda x: x[1], reverse=True))
+        return results
+
+    def fill_mask(self, masked_input: str, topk=5):
+        return self.fill_mask_batch([masked_input], topk=topk)[0]
@@ -0,0 +1,160 @@
+import argparse
+import os
+import threading
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+
+from loguru import logger
+
+# the socket lives in a directory only the server user can enter, never directly in a shared /tmp
+DEFAULT_ADDRESS = "./model/run/augmentation-model.sock"
+
+
+def encode_authkey(authkey):
+    """
+    The shared secret of the server and its clients as bytes: connections are authenticated before
+    anything is unpickled, so serving without one is refused.
+    """
+    authkey = str(authkey)
+    if not authkey:
+        raise ValueError("MODEL_SERVER_AUTHKEY must be set to use the model server")
+    return authkey.encode("utf-8")
+
+
+class ModelServer:
+    """
+    Serves PhoBERT and the fastText index to local API workers over a Unix socket.
+
+    Every client connection is handled in its own thread; the masked LM is expected to have
+    micro-batching enabled so that inputs from all connected workers share forward passes.
+    """
+
+    def __init__(self, address, authkey, masked_lm, fasttext_data):
+        self.address = address
+        self.authkey = encode_authkey(authkey)
+        self.methods = {
+            "fill_mask_batch": masked_lm.fill_mask_batch,
+            "score_candidates": masked_lm.score_candidates,
+            "most_similar_batch": fasttext_data.most_similar_batch,
+        }
+
+    def handle(self, connection):
+        with connection:
+            while True:
+                try:
+                    method, args = connection.recv()
+                except (EOFError, ConnectionError):
+                    break
+
+                try:
+                    connection.send(("ok", self.methods[method](*args)))
+                except Exception as e:
+                    logger.exception(f"Model server failed on {method}")
+                    connection.send(("error", f"{type(e).__name__}: {e}"))
+
+    def serve_forever(self):
+        directory = os.path.dirname(os.path.abspath(self.address))
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        os.chmod(directory, 0o700)
+        if os.path.exists(self.address):
+            os.remove(self.address)
+
+        with Listener(self.address, family="AF_UNIX", authkey=self.authkey) as listener:
+            os.chmod(self.address, 0o600)
+            logger.info(f"Model server listening on {self.address}")
+            while True:
+                try:
+                    connection = listener.accept()
+                except (AuthenticationError, EOFError, ConnectionError) as e:
+                    logger.warning(f"Model server rejected a connection: {e}")
+                    continue
+                threading.Thread(target=self.handle, args=(connection,), daemon=True).start()
+
+
+class ModelClient:
+    """
+    Drop-in stand-in for ``phobert.fill_mask``, ``MaskedLM`` and the fastText index that forwards
+    every call to a ``ModelServer``. Each thread keeps its own connection, which is reopened once
+    when it was dropped (e.g. by a server restart).
+    """
+
+    def __init__(self, address, authkey):
+        self.address = address
+        self.authkey = encode_authkey(authkey)
+        self.local = threading.local()
+
+    def _connection(self):
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            connection = self.local.connection = Client(self.address, family="AF_UNIX", authkey=self.authkey)
+        return connection
+
+    def _close(self):
+        connection = getattr(self.local, "connection", None)
+        self.local.connection = None
+        if connection is not None:
+            try:
+                connection.close()
+            except OSError:
+                pass
+
+    def _request(self, method, args):
+        connection = self._connection()
+        connection.send((method, args))
+        return connection.recv()
+
+    def _call(self, method, *args):
+        try:
+            status, result = self._request(method, args)
+        except (EOFError, ConnectionError):
+            # the served methods have no side effects, so the request is simply sent again
+            self._close()
+            status, result = self._request(method, args)
+        if status == "error":
+            raise RuntimeError(result)
+        return result
+
+    def fill_mask_batch(self, masked_inputs, topk=5):
+        if not masked_inputs:
+            return []
+        return self._call("fill_mask_batch", masked_inputs, topk)
+
+    def fill_mask(self, masked_input, topk=5):
+        return self.fill_mask_batch([masked_input], topk=topk)[0]
+
+    def score_candidates(self, masked_inputs, candidates):
+        if not masked_inputs:
+            return []
+        return self._call("score_candidates", masked_inputs, candidates)
+
+    def most_similar_batch(self, words, topk=20):
+        if not words:
+            return []
+        return self._call("most_similar_batch", words, topk)
+
+    def most_similar(self, word, topk=20):
+        return self.most_similar_batch([word], topk=topk)[0]
+
+
+if __name__ == "__main__":
+    from app.core.config import (
+        MODEL_SERVER_ADDRESS,
+        MODEL_SERVER_AUTHKEY,
+        PHOBERT_BATCH_SIZE,
+        PHOBERT_CACHE_SIZE,
+        PHOBERT_INFERENCE_MODE,
+        PHOBERT_MAX_BATCH_SIZE,
+        PHOBERT_MAX_WAIT_MS
+    )
+    from app.services.synonym.masked_lm import MaskedLM
+    from app.services.synonym_handler import SynonymHandler
+
+    parser = argparse.ArgumentParser(description="Run PhoBERT and the fastText index in a dedicated local process")
+    parser.add_argument("--address", default=MODEL_SERVER_ADDRESS or DEFAULT_ADDRESS)
+    args = parser.parse_args()
+
+    masked_lm = MaskedLM(SynonymHandler.load_phobert(PHOBERT_INFERENCE_MODE),
+                         batch_size=PHOBERT_BATCH_SIZE,
+                         cache_size=PHOBERT_CACHE_SIZE)
+    masked_lm.enable_micro_batching(max_batch_size=PHOBERT_MAX_BATCH_SIZE, max_wait_ms=PHOBERT_MAX_WAIT_MS)
+    ModelServer(args.address, MODEL_SERVER_AUTHKEY, masked_lm, SynonymHandler.load_fasttext()).serve_forever()
@@ -0,0 +1,87 @@
+import argparse
+import os
+
+import numpy as np
+from tqdm import tqdm
+
+from app.services.synonym.utils import staged_dir
+from app.services.synonym.vocab import Vocab
+
+IDS_FILE = "ids.npy"
+SCORES_FILE = "scores.npy"
+
+
+class NeighbourTable:
+    """
+    Precomputed top-N fastText neighbours (row ids and scores) for every word of the vocabulary.
+
+    Exposes the same lookup interface as ``FastTextVectors`` but answers from the table,
+    so no vector math is done at request time. Words are looked up in the memory-mapped ``Vocab``.
+    """
+
+    def __init__(self, words, ids, scores):
+        self.words = Vocab.from_words(words)
+        self.ids = ids
+        self.scores = scores
+
+    def __contains__(self, word):
+        return word in self.words
+
+    def __len__(self):
+        return len(self.words)
+
+    @classmethod
+    def build(cls, vectors, topk=20, batch_size=1024):
+        n_words = len(vectors)
+        ids = np.empty((n_words, topk), dtype=np.int32)
+        scores = np.empty((n_words, topk), dtype=np.float16)
+
+        for start in tqdm(range(0, n_words, batch_size)):
+            rows = np.arange(start, min(start + batch_size, n_words))
+            ids[rows], scores[rows] = vectors.search(rows, topk=topk)
+
+        return cls(vectors.words, ids, scores)
+
+    def save(self, path):
+        with staged_dir(path) as staging:
+            self.words.save(staging)
+            np.save(os.path.join(staging, IDS_FILE), self.ids)
+            np.save(os.path.join(staging, SCORES_FILE), self.scores)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        mmap_mode = "r" if mmap else None
+        words = Vocab.load(path)
+        ids = np.load(os.path.join(path, IDS_FILE), mmap_mode=mmap_mode)
+        scores = np.load(os.path.join(path, SCORES_FILE), mmap_mode=mmap_mode)
+        return cls(words, ids, scores)
+
+    def most_similar(self, word, topk=20):
+        return self.most_similar_batch([word], topk=topk)[0]
+
+    def most_similar_batch(self, words, topk=20):
+        results = []
+        for row in self.words.lookup(words):
+            if row < 0:
+                results.append([])
+                continue
+            results.append([(self.words[idx], float(score))
+                            for idx, score in zip(self.ids[row, :topk], self.scores[row, :topk]) if idx >= 0])
+        return results
+
+
+if __name__ == "__main__":
+    from app.core.config import FASTTEXT_BINARY_PATH, FASTTEXT_PATH, NEIGHBOUR_TABLE_PATH
+    from app.services.synonym.vectors import FastTextVectors
+
+    parser = argparse.ArgumentParser(description="Precompute the fastText synonym neighbour table")
+    default_vectors = FASTTEXT_BINARY_PATH if os.path.isdir(FASTTEXT_BINARY_PATH) else FASTTEXT_PATH
+    parser.add_argument("--vectors", default=default_vectors, help="fastText .vec file or binary store directory")
+    parser.add_argument("--output", default=NEIGHBOUR_TABLE_PATH)
+    parser.add_argument("--num-words", type=int, default=10000)
+    parser.add_argument("--topk", type=int, default=20)
+    parser.add_argument("--batch-size", type=int, default=1024)
+    args = parser.parse_args()
+
+    fasttext_vectors = FastTextVectors.open(args.vectors, num_words=args.num_words)
+    NeighbourTable.build(fasttext_vectors, topk=args.topk, batch_size=args.batch_size).save(args.output)
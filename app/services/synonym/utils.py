@@ -0,0 +1,52 @@
+import os
+import shutil
+from contextlib import contextmanager
+
+import numpy as np
+
+
+def load_vocab(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read().split("\n")[:-1]
+
+
+def save_vocab(words, path):
+    with open(path, "w", encoding="utf-8") as f:
+        for word in words:
+            f.write(word + "\n")
+
+
+def top_k(scores, k):
+    """
+    Indices of the ``k`` largest scores along the last axis, sorted by descending score.
+    """
+    k = min(k, scores.shape[-1])
+    if k <= 0:
+        return np.empty(scores.shape[:-1] + (0,), dtype=np.int64)
+    top = np.argpartition(-scores, k - 1, axis=-1)[..., :k]
+    order = np.argsort(-np.take_along_axis(scores, top, axis=-1), axis=-1, kind="stable")
+    return np.take_along_axis(top, order, axis=-1)
+
+
+@contextmanager
+def staged_dir(path):
+    """
+    A new directory next to ``path`` that replaces it once the block completes, so an interrupted
+    write never leaves a partly written ``path`` behind.
+    """
+    staging = f"{path}.tmp.{os.getpid()}"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    try:
+        yield staging
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    previous = f"{path}.old.{os.getpid()}" if os.path.exists(path) else None
+    if previous:
+        os.replace(path, previous)
+    os.replace(staging, path)
+    if previous:
+        # files mapped from the previous directory stay valid until they are closed
+        shutil.rmtree(previous)
@@ -0,0 +1,227 @@
+import argparse
+import io
+import os
+from typing import List, Union
+
+import numpy as np
+from tqdm import tqdm
+
+from app.services.synonym.utils import staged_dir, top_k
+from app.services.synonym.vocab import Vocab
+
+MATRIX_FILE = "vectors.npy"
+SCALES_FILE = "scales.npy"
+DTYPES = {"float32": np.float32, "float16": np.float16, "int8": np.int8}
+
+
+def read_vec_file(filename, num_words=None):
+    """
+    Yield (word, vector) pairs from a fastText ``.vec`` text file, preceded by its (n_words, dim) header.
+    """
+    with io.open(filename, 'r', encoding='utf-8', newline='\n', errors='ignore') as fin:
+        n_words, dim = map(int, fin.readline().split())
+        if num_words is not None:
+            n_words = min(n_words, num_words)
+        yield n_words, dim
+
+        for i, line in enumerate(fin):
+            if i == n_words:
+                break
+            tokens = line.rstrip().split(' ')
+            yield tokens[0], np.asarray(tokens[1:], dtype=np.float32)
+
+
+class FastTextVectors:
+    """
+    fastText vectors held as one contiguous row-normalized matrix with a word -> row index.
+
+    The matrix may be stored as float32, float16 or int8; int8 rows carry a float32 scale
+    (``vector = matrix[row] * scales[row]``). Scores are computed block by block so that a
+    quantized matrix is never expanded to float32 as a whole.
+
+    ``words`` is a ``Vocab``; a plain list of words is converted to one.
+    """
+    block_size = 65536
+    # rows converted to float32 at a time while scoring: 2048 x 300 floats are 2.3MB, and stay in cache
+    score_block_size = 2048
+
+    def __init__(self, words: Union[Vocab, List[str]], matrix: np.ndarray, scales: np.ndarray = None):
+        self.words = Vocab.from_words(words)
+        self.matrix = matrix
+        self.scales = scales
+
+    def __contains__(self, word):
+        return word in self.words
+
+    def __len__(self):
+        return len(self.matrix)
+
+    @staticmethod
+    def normalize(matrix):
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        return matrix / norms
+
+    @property
+    def is_quantized(self):
+        return self.matrix.dtype != np.float32
+
+    @property
+    def nbytes(self):
+        return self.matrix.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def quantize(self, dtype="float16"):
+        """
+        Return a copy of the store with its matrix converted to ``dtype`` (float32, float16 or int8),
+        or the store itself when it is already stored as ``dtype``.
+        """
+        dtype = DTYPES[dtype]
+        if self.matrix.dtype == dtype:
+            return self
+
+        matrix = np.empty(self.matrix.shape, dtype=dtype)
+        scales = np.empty(len(self), dtype=np.float32) if dtype == np.int8 else None
+        for start in range(0, len(self), self.block_size):
+            block = self.get_vectors(slice(start, start + self.block_size))
+            if dtype == np.int8:
+                block_scales = np.abs(block).max(axis=1) / 127
+                block_scales[block_scales == 0] = 1
+                block = np.rint(block / block_scales[:, None])
+                scales[start:start + self.block_size] = block_scales
+            matrix[start:start + self.block_size] = block
+
+        return FastTextVectors(self.words, matrix, scales)
+
+    def get_vectors(self, rows):
+        vectors = np.asarray(self.matrix[rows], dtype=np.float32)
+        if self.scales is not None:
+            vectors *= self.scales[rows, None]
+        return vectors
+
+    def scores(self, queries):
+        """
+        Cosine similarity of each query against every row. A quantized matrix is converted to float32
+        ``score_block_size`` rows at a time, so the peak memory of a call is the (queries x rows) float32
+        result plus one ``score_block_size x dim`` float32 block per concurrent call.
+        """
+        if self.matrix.dtype == np.float32:
+            return queries @ self.matrix.T
+
+        scores = np.empty((len(queries), len(self)), dtype=np.float32)
+        for start in range(0, len(self), self.score_block_size):
+            end = start + self.score_block_size
+            scores[:, start:end] = queries @ self.matrix[start:end].T.astype(np.float32)
+        if self.scales is not None:
+            scores *= self.scales
+        return scores
+
+    @classmethod
+    def from_vec_file(cls, filename, num_words=10000):
+        reader = read_vec_file(filename, num_words=num_words)
+        n_words, dim = next(reader)
+        words = []
+        matrix = np.empty((n_words, dim), dtype=np.float32)
+        for word, vector in tqdm(reader, total=n_words):
+            matrix[len(words)] = vector
+            words.append(word)
+        return cls(words, cls.normalize(matrix[:len(words)]))
+
+    @classmethod
+    def convert_vec_file(cls, filename, path, num_words=None):
+        """
+        Convert a ``.vec`` text file into a binary store: a row-normalized float32 ``vectors.npy``
+        and the vocabulary, written row by row so the full matrix never has to fit in memory.
+        The store is written in a staging directory that only replaces ``path`` once it is complete.
+        """
+        reader = read_vec_file(filename, num_words=num_words)
+        n_words, dim = next(reader)
+        with staged_dir(path) as staging:
+            matrix_path = os.path.join(staging, MATRIX_FILE)
+            matrix = np.lib.format.open_memmap(matrix_path, mode="w+", dtype=np.float32, shape=(n_words, dim))
+            words = []
+            for word, vector in tqdm(reader, total=n_words):
+                norm = np.linalg.norm(vector)
+                matrix[len(words)] = vector / norm if norm else vector
+                words.append(word)
+            matrix.flush()
+            if len(words) < n_words:
+                # the file has fewer lines than its header announces
+                cls._trim_matrix(matrix_path, matrix, len(words))
+            del matrix
+            Vocab.from_words(words).save(staging)
+
+    @classmethod
+    def _trim_matrix(cls, matrix_path, matrix, n_rows):
+        trimmed_path = matrix_path + ".trimmed"
+        trimmed = np.lib.format.open_memmap(trimmed_path, mode="w+", dtype=matrix.dtype,
+                                            shape=(n_rows, matrix.shape[1]))
+        for start in range(0, n_rows, cls.block_size):
+            trimmed[start:start + cls.block_size] = matrix[start:min(start + cls.block_size, n_rows)]
+        trimmed.flush()
+        del trimmed
+        os.replace(trimmed_path, matrix_path)
+
+    def save(self, path):
+        with staged_dir(path) as staging:
+            np.save(os.path.join(staging, MATRIX_FILE), self.matrix)
+            if self.scales is not None:
+                np.save(os.path.join(staging, SCALES_FILE), self.scales)
+            self.words.save(staging)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        words = Vocab.load(path)
+        matrix = np.load(os.path.join(path, MATRIX_FILE), mmap_mode="r" if mmap else None)
+        scales_path = os.path.join(path, SCALES_FILE)
+        scales = np.load(scales_path) if os.path.exists(scales_path) else None
+        return cls(words, matrix, scales)
+
+    @classmethod
+    def open(cls, path, num_words=10000):
+        if os.path.isdir(path):
+            return cls.load(path)
+        return cls.from_vec_file(path, num_words=num_words)
+
+    def most_similar(self, word, topk=20):
+        return self.most_similar_batch([word], topk=topk)[0]
+
+    def search(self, rows, topk=20):
+        """
+        Return the ids and scores of the ``topk`` nearest neighbours of the given rows,
+        excluding each row itself.
+        """
+        rows = np.asarray(rows)
+        scores = self.scores(self.get_vectors(rows))
+        scores[np.arange(len(rows)), rows] = -np.inf
+        top = top_k(scores, topk)
+        return top, np.take_along_axis(scores, top, axis=-1)
+
+    def most_similar_batch(self, words, topk=20):
+        """
+        Return, for each word, its ``topk`` nearest neighbours as (word, score) pairs,
+        computed with a single matrix product for the whole batch. Unknown words get [].
+        """
+        results = [[] for _ in words]
+        known = [(i, int(row)) for i, row in enumerate(self.words.lookup(words)) if row >= 0]
+        if not known:
+            return results
+
+        ids, scores = self.search([row for _, row in known], topk=topk)
+        for (i, _), row_ids, row_scores in zip(known, ids, scores):
+            results[i] = [(self.words[idx], float(score)) for idx, score in zip(row_ids, row_scores) if idx >= 0]
+        return results
+
+
+if __name__ == "__main__":
+    from app.core.config import FASTTEXT_BINARY_PATH, FASTTEXT_PATH
+
+    parser = argparse.ArgumentParser(description="Convert a fastText .vec file into a memory-mappable binary store")
+    parser.add_argument("--vectors", default=FASTTEXT_PATH)
+    parser.add_argument("--output", default=FASTTEXT_BINARY_PATH)
+    parser.add_argument("--num-words", type=int, default=None)
+    parser.add_argument("--dtype", choices=list(DTYPES), default="float32")
+    args = parser.parse_args()
+
+    FastTextVectors.convert_vec_file(args.vectors, args.output, num_words=args.num_words)
+    if args.dtype != "float32":
+        FastTextVectors.load(args.output).quantize(args.dtype).save(args.output)
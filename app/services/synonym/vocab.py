@@ -0,0 +1,90 @@
+import hashlib
+import os
+from collections.abc import Sequence
+
+import numpy as np
+
+from app.services.shared_tables import load_mapped
+from app.services.synonym.utils import load_vocab, save_vocab
+
+VOCAB_FILE = "vocab.txt"
+SORTED_WORDS_FILE = "vocab.sorted.npy"
+ROWS_FILE = "vocab.rows.npy"
+POSITIONS_FILE = "vocab.positions.npy"
+
+
+class Vocab(Sequence):
+    """
+    Read-only word list of a vector store, indexed by row.
+
+    The words are kept as a sorted, memory-mapped array of UTF-8 byte strings searched with
+    ``np.searchsorted``, with the row of every sorted word and the sorted position of every row,
+    so loading a vocabulary builds no list or dict in memory. UTF-8 bytes sort in code point order
+    and take a quarter of the space of a unicode array.
+    """
+
+    def __init__(self, sorted_words, rows, positions):
+        self.sorted_words = sorted_words
+        self.rows = rows
+        self.positions = positions
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return [self[i] for i in range(*row.indices(len(self)))]
+        return self.sorted_words[self.positions[row]].decode("utf-8")
+
+    def __contains__(self, word):
+        return isinstance(word, str) and self.index(word) is not None
+
+    def index(self, word):
+        """
+        Row of ``word``, None when it is not in the vocabulary.
+        """
+        row = self.lookup([word])[0]
+        return int(row) if row >= 0 else None
+
+    def lookup(self, words):
+        """
+        Rows of ``words`` as an array, -1 for the words that are not in the vocabulary.
+        """
+        keys = np.array([word.encode("utf-8") for word in words], dtype=bytes)
+        if not len(keys) or not len(self):
+            return np.full(len(keys), -1, dtype=np.int64)
+        positions = np.minimum(np.searchsorted(self.sorted_words, keys), len(self) - 1)
+        return np.where(self.sorted_words[positions] == keys, self.rows[positions], -1).astype(np.int64)
+
+    @property
+    def checksum(self):
+        digest = hashlib.sha1(self.sorted_words.dtype.str.encode())
+        digest.update(np.ascontiguousarray(self.sorted_words).data)
+        digest.update(np.ascontiguousarray(self.rows).data)
+        return digest.hexdigest()
+
+    @classmethod
+    def from_words(cls, words):
+        if isinstance(words, cls):
+            return words
+        encoded = np.array([word.encode("utf-8") for word in words], dtype=bytes)
+        rows = np.argsort(encoded, kind="stable").astype(np.int32)
+        positions = np.empty_like(rows)
+        positions[rows] = np.arange(len(rows), dtype=np.int32)
+        return cls(encoded[rows], rows, positions)
+
+    def save(self, path):
+        np.save(os.path.join(path, SORTED_WORDS_FILE), self.sorted_words)
+        np.save(os.path.join(path, ROWS_FILE), self.rows)
+        np.save(os.path.join(path, POSITIONS_FILE), self.positions)
+        # the plain word list stays next to the arrays for tools that read it
+        save_vocab(self, os.path.join(path, VOCAB_FILE))
+
+    @classmethod
+    def load(cls, path):
+        if not os.path.exists(os.path.join(path, SORTED_WORDS_FILE)):
+            # stores written before the sorted arrays existed
+            return cls.from_words(load_vocab(os.path.join(path, VOCAB_FILE)))
+        return cls(load_mapped(os.path.join(path, SORTED_WORDS_FILE)),
+                   load_mapped(os.path.join(path, ROWS_FILE)),
+                   load_mapped(os.path.join(path, POSITIONS_FILE)))
@@ -1,15 +1,43 @@
-import io
-import random
+import os
 import string
 from typing import List
 
 import numpy as np
-from tqdm import tqdm
-from fairseq.models.roberta import RobertaModel
-from fairseq.data.encoders.fastbpe import fastBPE
-
-from app.core.config import FASTTEXT_PATH, PHOBERT_PATH, STOPWORD_PATH
-from app.services.base_augmenter import Augmenter
+import torch
+from loguru import logger
+
+from app.core.config import (
+    ANN_INDEX_PATH,
+    ANN_MIN_RECALL,
+    ANN_NPROBE,
+    FASTTEXT_BINARY_PATH,
+    FASTTEXT_CACHE_SIZE,
+    FASTTEXT_DTYPE,
+    FASTTEXT_PATH,
+    MODEL_SERVER_ADDRESS,
+    MODEL_SERVER_AUTHKEY,
+    NEIGHBOUR_TABLE_PATH,
+    PHOBERT_BATCH_SIZE,
+    PHOBERT_CACHE_SIZE,
+    PHOBERT_INFERENCE_MODE,
+    PHOBERT_LEAN_PATH,
+    PHOBERT_MAX_BATCH_SIZE,
+    PHOBERT_MAX_WAIT_MS,
+    PHOBERT_MICRO_BATCHING,
+    PHOBERT_NUM_THREADS,
+    PHOBERT_PATH,
+    STOPWORD_PATH,
+    SYNONYM_MIN_PROB,
+    SYNONYM_SCORING
+)
+from app.services.base_augmenter import PUNCTUATION, Augmenter, eligible_token_mask
+from app.services.cache import LRUCache
+from app.services.synonym.ann_index import IVFIndex
+from app.services.synonym import lean_roberta
+from app.services.synonym.masked_lm import MASK_TOKEN, MaskedLM, quantize_dynamic
+from app.services.synonym.model_server import ModelClient
+from app.services.synonym.neighbours import NeighbourTable
+from app.services.synonym.vectors import FastTextVectors
 
 
 class BPE:
@@ -19,16 +47,78 @@ class BPE:
 class SynonymHandler(Augmenter):
     fasttext_data = None
     phobert = None
+    masked_lm = None
+    stop_words = []
+    ineligible_tokens = PUNCTUATION
+    similar_word_cache = LRUCache(maxsize=FASTTEXT_CACHE_SIZE)
+    scoring = SYNONYM_SCORING
+    min_prob = SYNONYM_MIN_PROB
 
     @classmethod
     def get_model(cls):
         if cls.fasttext_data is None and cls.phobert is None:
             cls.stop_words = cls.load_stop_words()
-            cls.fasttext_data = cls.load_vectors(FASTTEXT_PATH)
+            cls.ineligible_tokens = np.union1d(PUNCTUATION, np.array(cls.stop_words, dtype=str))
+
+            if MODEL_SERVER_ADDRESS:
+                client = ModelClient(MODEL_SERVER_ADDRESS, MODEL_SERVER_AUTHKEY)
+                cls.fasttext_data = client
+                cls.phobert = client
+                cls.masked_lm = client
+                return
+
+            cls.fasttext_data = cls.load_fasttext()
+
+            if PHOBERT_NUM_THREADS > 0:
+                torch.set_num_threads(PHOBERT_NUM_THREADS)
+            cls.phobert = cls.load_phobert(PHOBERT_INFERENCE_MODE)
+            cls.masked_lm = MaskedLM(cls.phobert, batch_size=PHOBERT_BATCH_SIZE, cache_size=PHOBERT_CACHE_SIZE)
+            if PHOBERT_MICRO_BATCHING:
+                cls.masked_lm.enable_micro_batching(max_batch_size=PHOBERT_MAX_BATCH_SIZE,
+                                                    max_wait_ms=PHOBERT_MAX_WAIT_MS)
+
+    @staticmethod
+    def load_phobert(inference_mode="fp32"):
+        if os.path.isdir(PHOBERT_LEAN_PATH):
+            phobert = lean_roberta.load(PHOBERT_LEAN_PATH)
+        else:
+            # fairseq is only imported when no lean checkpoint was exported, its import alone is slow
+            from fairseq.models.roberta import RobertaModel
+            from fairseq.data.encoders.fastbpe import fastBPE
 
             args = BPE()
-            cls.phobert = RobertaModel.from_pretrained(PHOBERT_PATH, checkpoint_file='model.pt')
-            cls.phobert.bpe = fastBPE(args)
+            phobert = RobertaModel.from_pretrained(PHOBERT_PATH, checkpoint_file='model.pt')
+            phobert.bpe = fastBPE(args)
+        phobert.eval()
+
+        if inference_mode == "int8":
+            phobert.model = quantize_dynamic(phobert.model)
+        return phobert
+
+    @classmethod
+    def load_fasttext(cls):
+        if os.path.isdir(NEIGHBOUR_TABLE_PATH):
+            return NeighbourTable.load(NEIGHBOUR_TABLE_PATH)
+
+        if os.path.isdir(FASTTEXT_BINARY_PATH):
+            fasttext_vectors = FastTextVectors.load(FASTTEXT_BINARY_PATH)
+        else:
+            fasttext_vectors = cls.load_vectors(FASTTEXT_PATH)
+
+        float32_size = fasttext_vectors.matrix.size * 4
+        # a store quantized offline is used as is (memory-mapped), FASTTEXT_DTYPE only applies to float32 stores
+        if not fasttext_vectors.is_quantized:
+            fasttext_vectors = fasttext_vectors.quantize(FASTTEXT_DTYPE)
+        logger.info(f"fastText table: {fasttext_vectors.nbytes / 2 ** 20:.1f}MB as {fasttext_vectors.matrix.dtype}, "
+                    f"{(float32_size - fasttext_vectors.nbytes) / 2 ** 20:.1f}MB saved against float32")
+
+        if os.path.isdir(FASTTEXT_BINARY_PATH) and os.path.isdir(ANN_INDEX_PATH):
+            index = IVFIndex.load_index(ANN_INDEX_PATH, fasttext_vectors, nprobe=ANN_NPROBE, min_recall=ANN_MIN_RECALL)
+            if index is not None:
+                logger.info(f"fastText IVF index: nprobe {index.nprobe}, recall@10 {index.recall:.3f}")
+                return index
+            logger.warning(f"fastText IVF index in {ANN_INDEX_PATH} cannot be used, using exact search")
+        return fasttext_vectors
 
     @staticmethod
     def load_stop_words():
@@ -39,96 +129,112 @@ class SynonymHandler(Augmenter):
 
     @staticmethod
     def load_vectors(filename, num_words=10000):
-        fin = io.open(filename, 'r', encoding='utf-8', newline='\n', errors='ignore')
-        fin.readline().split()
-        data = {}
-        for i, line in enumerate(tqdm(fin)):
-            tokens = line.rstrip().split(' ')
-            data[tokens[0]] = np.array([float(val) for val in tokens[1:]])
-            data[tokens[0]] /= np.linalg.norm(data[tokens[0]])
-            if i > num_words:
-                break
-        return data
+        return FastTextVectors.from_vec_file(filename, num_words=num_words)
 
     def _is_eligible_token(self, token):
         return token not in string.punctuation and token not in self.stop_words and not token.startswith("MASK")
 
-    def _find_similar_word(self, word, num_similar=1):
-        ls_similar_word = []
-
-        if word not in self.fasttext_data:
-            return []
-
-        ref_v = self.fasttext_data[word]
+    def _eligible_mask(self, tokens):
+        return eligible_token_mask(tokens, ineligible=self.ineligible_tokens)
 
-        top_num = 20
-        top_w = [''] * top_num
-        top_s = [-1] * top_num
-
-        for k in self.fasttext_data.keys():
-            if word == k:
-                continue
-            score = np.dot(ref_v, self.fasttext_data[k])
-            if score < np.min(top_s):
-                continue
-
-            for i in range(top_num):
-                if score >= top_s[i]:
-                    top_w[i + 1:] = top_w[i:top_num - 1]
-                    top_w[i] = k
-                    top_s[i + 1:] = top_s[i:top_num - 1]
-                    top_s[i] = score
-                    break
+    @staticmethod
+    def _filter_similar_words(word, neighbours, num_similar=1):
+        ls_similar_word = []
 
-        count = 0
-        for i in range(top_num):
-            if count >= num_similar:
-                return ls_similar_word
+        for neighbour, _ in neighbours:
+            if len(ls_similar_word) >= num_similar:
+                break
 
-            if top_w[i].lower() == word:
+            if neighbour.lower() == word:
                 continue
 
-            ls_similar_word.append(top_w[i].lower())
-            count += 1
+            ls_similar_word.append(neighbour.lower())
 
         return ls_similar_word
 
-    def _get_synonyms(self, idx, tokens, num_similar=5, num_keep=1):
-        chosen_synonyms = []
+    def _find_similar_word(self, word, num_similar=1):
+        return self._find_similar_words([word], num_similar=num_similar)[0]
+
+    def _find_similar_words(self, words, num_similar=1, top_num=20):
+        def compute(missing):
+            neighbours = self.fasttext_data.most_similar_batch([key[0] for key in missing], topk=top_num)
+            return [self._filter_similar_words(key[0], word_neighbours, num_similar=num_similar)
+                    for key, word_neighbours in zip(missing, neighbours)]
 
-        synonyms = self._find_similar_word(tokens[idx], num_similar=num_similar)
+        keys = [(word, num_similar, top_num) for word in words]
+        return self.similar_word_cache.get_many(keys, compute)
 
-        tokens[idx] = '<mask>'
+    @staticmethod
+    def _mask_window(idx, tokens):
+        tokens = tokens.copy()
+        tokens[idx] = MASK_TOKEN
         if idx > 256:
             start, end = idx - 100, idx + 100
         else:
             start, end = 0, 256
-        phobert_filled = [_[2].lower() for _ in self.phobert.fill_mask(' '.join(tokens[start:end]), topk=50)]
+        return ' '.join(tokens[start:end])
+
+    def _get_synonyms(self, idx, tokens, num_similar=5, num_keep=1, synonyms=None):
+        if synonyms is None:
+            synonyms = self._find_similar_word(tokens[idx], num_similar=num_similar)
+        return self._get_synonyms_batch([idx], tokens, [synonyms], num_keep=num_keep)[0]
+
+    def _get_synonyms_batch(self, indices, tokens, synonyms, num_keep=1):
+        return self._choose_synonyms([(idx, tokens) for idx in indices], synonyms, num_keep=num_keep)
+
+    def _choose_synonyms(self, positions, synonyms, num_keep=1):
+        """
+        Keep, for each (index, tokens) position, the fastText synonyms PhoBERT also predicts there.
+        The masked windows of all positions go through PhoBERT as a single batch.
 
-        for synonym in synonyms:
-            # if len(chosen_synonyms) < num_keep:
-            if synonym in phobert_filled and len(chosen_synonyms) < num_keep:
-                chosen_synonyms.append(synonym)
+        With ``scoring="candidates"`` PhoBERT only scores the fastText candidates, which are ranked
+        by probability and kept above ``min_prob``; otherwise a candidate must be in PhoBERT's top 50.
+        """
+        chosen_synonyms = [[] for _ in positions]
+        masked = [i for i, candidates in enumerate(synonyms) if candidates]
+        masked_inputs = [self._mask_window(*positions[i]) for i in masked]
+
+        if self.scoring == "candidates":
+            scored = self.masked_lm.score_candidates(masked_inputs, [synonyms[i] for i in masked])
+            for i, ranked in zip(masked, scored):
+                chosen_synonyms[i] = [synonym for synonym, prob in ranked if prob >= self.min_prob][:num_keep]
+            return chosen_synonyms
+
+        for i, filled in zip(masked, self.masked_lm.fill_mask_batch(masked_inputs, topk=50)):
+            phobert_filled = [_[2].lower() for _ in filled]
+
+            for synonym in synonyms[i]:
+                if synonym in phobert_filled and len(chosen_synonyms[i]) < num_keep:
+                    chosen_synonyms[i].append(synonym)
 
         return chosen_synonyms
 
     def validate_action(self, action):
         assert action in ["substitute", "insert"], "Please choose action in {substitute, insert}"
 
-    def transform(self, action, tokens, eligible_indices, num_similar=5, num_keep=1, **kwargs) -> List[str]:
-        augmented_data = []
-        tmp = tokens.copy()
+    def transform(self, action, tokens, eligible_indices, rng=np.random, **kwargs) -> List[str]:
+        return self.transform_batch(action, [tokens], [eligible_indices], [rng], **kwargs)[0]
+
+    def transform_batch(self, action, tokens_batch, eligible_indices_batch, rngs, num_similar=5, num_keep=1,
+                        **kwargs) -> List[List[str]]:
+        positions = [(idx, tokens)
+                     for tokens, eligible_indices in zip(tokens_batch, eligible_indices_batch)
+                     for idx in eligible_indices]
+        similar_words = self._find_similar_words([tokens[idx] for idx, tokens in positions], num_similar=num_similar)
+        chosen_synonyms = iter(self._choose_synonyms(positions, similar_words, num_keep=num_keep))
 
-        for idx in eligible_indices:
-            synonyms = self._get_synonyms(idx, tokens.copy(), num_similar=num_similar, num_keep=num_keep)
+        augmented_batch = []
+        for tokens, eligible_indices, rng in zip(tokens_batch, eligible_indices_batch, rngs):
+            tmp = tokens.copy()
 
-            for synonym in synonyms:
-                if action == "substitute":
-                    tmp[idx] = synonym
-                else:
-                    random_idx = random.choice(range(len(tmp)))
-                    tmp.insert(random_idx, synonym)
+            for idx in eligible_indices:
+                for synonym in next(chosen_synonyms):
+                    if action == "substitute":
+                        tmp[idx] = synonym
+                    else:
+                        random_idx = rng.choice(len(tmp))
+                        tmp.insert(random_idx, synonym)
 
-        augmented_data.append(" ".join(tmp))
+            augmented_batch.append(self.remove_duplicate([" ".join(tmp)]))
 
-        return self.remove_duplicate(augmented_data)
+        return augmented_batch
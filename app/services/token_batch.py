@@ -0,0 +1,86 @@
+from typing import List
+
+import numpy as np
+
+
+class TokenBatch:
+    """
+    Many tokenized sentences stored column-wise: one flat token array plus row offsets,
+    so token-level edits are index operations over the whole batch.
+    """
+
+    def __init__(self, tokens, offsets):
+        self.tokens = tokens
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    @classmethod
+    def from_lists(cls, tokens_batch):
+        offsets = np.zeros(len(tokens_batch) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(tokens) for tokens in tokens_batch])
+        tokens = np.empty(offsets[-1], dtype=object)
+        tokens[:] = [token for tokens in tokens_batch for token in tokens]
+        return cls(tokens, offsets)
+
+    @property
+    def lengths(self):
+        return np.diff(self.offsets)
+
+    @property
+    def row_ids(self):
+        return np.repeat(np.arange(len(self)), self.lengths)
+
+    def flat_positions(self, indices_batch):
+        """
+        Flat positions of per-row token indices, with the row and the rank within the row of each position.
+        """
+        counts = np.array([len(indices) for indices in indices_batch], dtype=np.int64)
+        rows = np.repeat(np.arange(len(indices_batch)), counts)
+        starts = np.cumsum(counts) - counts
+        ranks = np.arange(counts.sum()) - np.repeat(starts, counts)
+        indices = np.concatenate([np.asarray(indices, dtype=np.int64) for indices in indices_batch]) \
+            if len(indices_batch) else np.zeros(0, dtype=np.int64)
+        return self.offsets[rows] + indices, rows, ranks
+
+    def blank(self, positions, blank="_"):
+        tokens = self.tokens.copy()
+        tokens[positions] = blank
+        return TokenBatch(tokens, self.offsets)
+
+    def delete(self, positions):
+        keep = np.ones(len(self.tokens), dtype=bool)
+        keep[positions] = False
+        offsets = np.zeros_like(self.offsets)
+        offsets[1:] = np.cumsum(np.bincount(self.row_ids[keep], minlength=len(self)))
+        return TokenBatch(self.tokens[keep], offsets)
+
+    def swap(self, positions, partners, ranks):
+        """
+        Swap every position with its partner. Swaps of the same row are applied in rank order, as if
+        one after the other; each round swaps one pair per row, so rows never conflict within a round.
+        """
+        order = np.arange(len(self.tokens))
+        for rank in range(int(ranks.max()) + 1 if len(ranks) else 0):
+            selected = ranks == rank
+            a, b = positions[selected], partners[selected]
+            order[a], order[b] = order[b], order[a]
+        return TokenBatch(self.tokens[order], self.offsets)
+
+    def random_positions(self, eligible, rows, rngs):
+        """
+        For each entry of ``rows`` (sorted by row, as returned by ``flat_positions``), a position drawn
+        uniformly among the ``eligible`` positions of that row, using the row's own random generator.
+        """
+        candidates = np.flatnonzero(eligible)
+        counts = np.bincount(self.row_ids[candidates], minlength=len(self))
+        starts = np.cumsum(counts) - counts
+
+        entries = np.bincount(rows, minlength=len(self))
+        draws = np.concatenate([rng.random(n) for rng, n in zip(rngs, entries)] + [np.zeros(0)])
+        return candidates[starts[rows] + (draws * counts[rows]).astype(np.int64)]
+
+    def to_strings(self, sep=" ") -> List[str]:
+        tokens = self.tokens.tolist()
+        return [sep.join(tokens[start:end]) for start, end in zip(self.offsets[:-1], self.offsets[1:])]
@@ -1,10 +1,10 @@
-import random
-
+import numpy as np
 from loguru import logger
 
 from app.services.dependency_tree.dep_tree import DepNode
 from app.services.dependency_tree.base_service import BaseService
-from app.services.utils import tokenize, revert_segmented_tokens
+from app.services.cache import cached_augment
+from app.services.utils import tokenize, revert_segmented_tokens, text_rng
 from app.services.word_segment.word_segment import TextProcessor
 from app.core.config import PHO_NLP_URL
 
@@ -51,16 +51,16 @@ class TreeHandler(BaseService):
         return node_dict, root_index
 
     @staticmethod
-    def random_drop_phrase(node_dict, root_index):
+    def random_drop_phrase(node_dict, root_index, rng=np.random):
         root_children = list(node_dict[root_index].children)
         root_avail_children = [child for child in root_children if child.children]
 
         if not root_avail_children:
             return node_dict, False
 
-        chosen_child = random.choice(root_avail_children)
+        chosen_child = root_avail_children[rng.choice(len(root_avail_children))]
         while not chosen_child.children:
-            chosen_child = random.choice(root_children)
+            chosen_child = root_children[rng.choice(len(root_children))]
         root_children.remove(chosen_child)
         node_dict[root_index].children = tuple(root_children)
 
@@ -80,7 +80,10 @@ class TreeHandler(BaseService):
 
         return node_dict, True
 
-    def augment(self, text, exclude, is_segmented, segment, **kwargs):
+    def augment(self, text, exclude, is_segmented, segment, seed=None, **kwargs):
+        return self.augment_batch([text], exclude, is_segmented, segment, seed=seed, **kwargs)[0]
+
+    def _augment(self, text, exclude, is_segmented, segment, rng):
         transform_text = text
         
         if exclude:
@@ -94,7 +97,7 @@ class TreeHandler(BaseService):
             annotations = self.annotate(transform_text)
 
             node_dict, root_index = self.create_tree(annotations)
-            node_dict, change = self.random_drop_phrase(node_dict, root_index)
+            node_dict, change = self.random_drop_phrase(node_dict, root_index, rng=rng)
 
             if not change:
                 return [text]
@@ -110,3 +113,14 @@ class TreeHandler(BaseService):
             raise e
             
         return transform_text
+
+    def augment_batch(self, texts, exclude, is_segmented, segment, seed=None, **kwargs):
+        if exclude:
+            return [[text] for text in texts]
+
+        self.init_session(False)
+        params = dict(is_segmented=is_segmented, segment=segment)
+        return cached_augment(self, None, texts, seed, params,
+                              lambda batch: [self._augment(text, exclude, is_segmented, segment,
+                                                           rng=text_rng(seed, text))
+                                             for text in batch])
@@ -1,35 +1,101 @@
 import re
+import zlib
+from functools import lru_cache
 
+import numpy as np
 
-TOKENIZER_REGEX = re.compile(r'(\W)')
+from app.core.config import MAX_CACHE_SIZE
+
+
+TOKENIZER_REGEX = re.compile(r'\w+|[^\w\s]')
+
+
+def tokenize_spans(text: str):
+    """
+    Tokens (word runs and single non-space symbols) with their (start, end) character offsets.
+    """
+    tokens, spans = [], []
+    for match in TOKENIZER_REGEX.finditer(text):
+        tokens.append(match.group())
+        spans.append(match.span())
+    return tokens, spans
 
 
 def tokenize(text: str):
-    tokens = TOKENIZER_REGEX.split(text)
-    return [t for t in tokens if len(t.strip()) > 0]
+    return TOKENIZER_REGEX.findall(text)
+
+
+def token_spans(text: str, tokens):
+    """
+    Offsets of ``tokens`` in ``text``, located left to right, for tokens produced by an arbitrary tokenizer.
+    """
+    spans = []
+    position = 0
+    for token in tokens:
+        start = text.find(token, position)
+        if start < 0:
+            raise ValueError(f"Token {token!r} not found in text after offset {position}")
+        position = start + len(token)
+        spans.append((start, position))
+    return spans
+
+
+def join_spans(text: str, spans, tokens):
+    """
+    Rebuild ``text`` with the token at each span replaced by the matching entry of ``tokens``,
+    keeping the original text between spans.
+    """
+    parts = []
+    position = 0
+    for (start, end), token in zip(spans, tokens):
+        parts.append(text[position:start])
+        parts.append(token)
+        position = end
+    parts.append(text[position:])
+    return "".join(parts)
+
+
+@lru_cache(maxsize=MAX_CACHE_SIZE)
+def _alternation_regex(patterns):
+    """
+    One regex matching any of ``patterns``; longer patterns are tried first, so an exclude
+    that is a prefix of another (or overlaps it) never splits the longer one.
+    """
+    return re.compile("|".join(re.escape(p) for p in sorted(patterns, key=len, reverse=True)))
 
 
 def mask_exclude_tokens(text, exclude):
     exclude_map = {}
-    count = 0
     mask = "MASK{}"
 
-    for token in exclude:
+    exclude = tuple(dict.fromkeys(token for token in exclude if token))
+    if not exclude:
+        return text, exclude_map
+
+    token_map = {}
+    for count, token in enumerate(exclude):
         tmp_mask = mask.format(count)
-        
-        # token = re.sub(r'([()+.?!*])', r'\\\1', token)
         exclude_map[tmp_mask] = token
-        text = text.replace(token, tmp_mask)
-        # text = re.sub(token, tmp_mask, text, flags=re.IGNORECASE)
-        count += 1
+        token_map[token] = tmp_mask
+
+    text = _alternation_regex(exclude).sub(lambda m: token_map[m.group()], text)
     return text, exclude_map
 
 
 def reconstruct(text, exclude_map):
-    for key, value in exclude_map.items():
-        # text = re.sub(key, value, text, flags=re.IGNORECASE)
-        text = text.replace(key, value)
-    return text
+    if not exclude_map:
+        return text
+
+    return _alternation_regex(tuple(exclude_map)).sub(lambda m: exclude_map[m.group()], text)
+
+
+def text_rng(seed, text):
+    """
+    Random generator for augmenting one text: reproducible from (seed, text) when ``seed`` is given.
+    """
+    if seed is None:
+        return np.random.default_rng()
+    return np.random.default_rng([seed, zlib.crc32(text.encode("utf-8"))])
 
 
 def revert_segmented_tokens(tokens):